@@ -0,0 +1,228 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+import http_pool
+import metrics
+
+# === Admission Config ===
+# Per-provider limits shared by every session in the process. 0 means unlimited. Budgets are
+# per minute: estimated tokens (prompt + max_tokens) for the LLMs, characters for ElevenLabs.
+PROVIDER_LIMITS = {
+    "openai": (int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "16")), int(os.getenv("AZURE_OPENAI_TPM", "0"))),
+    "gemini": (int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")), int(os.getenv("GEMINI_TPM", "0"))),
+    "elevenlabs": (int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "10")), int(os.getenv("ELEVENLABS_CHARS_PER_MINUTE", "0"))),
+}
+# A request that cannot be admitted within this long fails instead of hanging the turn
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "15"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+RETRY_STATUSES = (429, 503)
+
+# The caller's fair-share lane (the /ws/live session id, or "rest:<client address>" for the
+# REST API) and, inside a turn, its TurnTrace.
+# Tasks inherit both, so TTS requests started by a turn's pipeline are attributed to it.
+session_key = contextvars.ContextVar("session_key", default="default")
+turn_trace = contextvars.ContextVar("turn_trace", default=None)
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+# ~4 characters per token, the same estimate conversation.py budgets with
+def chat_cost(messages: list[dict], max_tokens: int) -> int:
+    return sum(len(message.get("content") or "") for message in messages) // 4 + max_tokens
+
+
+# === Per-provider Limiter ===
+# A request is admitted while fewer than max_concurrent are in flight, the per-minute budget
+# (a token bucket refilled continuously) covers its cost, and no 429 pause is in effect.
+# Waiters queue per session and are admitted round-robin across sessions, so a session with
+# many queued requests only ever gets its turn like everyone else.
+class ProviderLimiter:
+    def __init__(self, name: str, max_concurrent: int = 0, per_minute: int = 0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.per_minute = per_minute
+        self.active = 0
+        self._budget = float(per_minute)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._timer = None
+        self._stats = {"admitted": 0, "queued": 0, "timeouts": 0, "throttled": 0, "retries": 0}
+
+    def _count(self, name: str):
+        self._stats[name] += 1
+        metrics.incr(f"upstream_{self.name}_{name}")
+
+    def _refill(self, now: float):
+        if self.per_minute:
+            self._budget = min(self.per_minute, self._budget + (now - self._refilled_at) * self.per_minute / 60)
+        self._refilled_at = now
+
+    # 0 when the request can go now, else seconds until the budget or pause allows it (None: a slot must free up)
+    def _delay(self, cost: int, now: float):
+        if self.max_concurrent and self.active >= self.max_concurrent:
+            return None
+        self._refill(now)
+        delay = self._paused_until - now
+        if self.per_minute:
+            # A request larger than the whole budget waits for a full bucket
+            delay = max(delay, (min(cost, self.per_minute) - self._budget) * 60 / self.per_minute)
+        return max(delay, 0)
+
+    def _admit(self, cost: int):
+        self.active += 1
+        self._budget -= cost
+        self._count("admitted")
+
+    def _dispatch(self):
+        self._timer = None
+        while self._queues:
+            key, waiters = next(iter(self._queues.items()))
+            future, cost = waiters[0]
+            if future.done():
+                waiters.popleft()
+            else:
+                delay = self._delay(cost, time.monotonic())
+                if delay is None:
+                    return
+                if delay > 0:
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                    return
+                waiters.popleft()
+                self._admit(cost)
+                future.set_result(None)
+            # The lane goes to the back of the rotation, or away once empty
+            if waiters:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+
+    async def acquire(self, key: str, cost: int) -> float:
+        if not self._queues and self._delay(cost, time.monotonic()) == 0:
+            self._admit(cost)
+            return 0.0
+        self._count("queued")
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append((future, cost))
+        if self._timer is None:
+            self._dispatch()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=UPSTREAM_QUEUE_TIMEOUT)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up
+                self.release()
+            future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                self._count("timeouts")
+                raise AdmissionTimeout(f"{self.name}: not admitted within {UPSTREAM_QUEUE_TIMEOUT:g}s") from None
+            raise
+        return time.perf_counter() - started
+
+    def release(self):
+        self.active -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    # A 429 pauses admissions for everyone, not just the request that got it
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._count("throttled")
+
+    def stats(self) -> dict:
+        return {"active": self.active, "queued_now": sum(map(len, self._queues.values())),
+                "budget": round(self._budget) if self.per_minute else None, **self._stats}
+
+
+limiters = {name: ProviderLimiter(name, *limits) for name, limits in PROVIDER_LIMITS.items()}
+
+
+def admission_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+# === Retry Timing ===
+def retry_after(response) -> float | None:
+    if (ms := response.headers.get("retry-after-ms")):
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# Full jitter on an exponential backoff; a Retry-After sets the floor, plus a little jitter
+# so queued callers do not all come back at once
+def backoff(attempt: int, floor: float = None) -> float:
+    if floor is not None:
+        return floor + random.uniform(0, UPSTREAM_BACKOFF_BASE)
+    return random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+
+@asynccontextmanager
+async def _slot(provider: str, cost: int):
+    limiter = limiters[provider]
+    waited = await limiter.acquire(session_key.get(), cost)
+    metrics.observe("upstream_queue_wait_seconds", waited, provider=provider)
+    if (trace := turn_trace.get()) is not None:
+        trace.queued(waited)
+    try:
+        yield limiter
+    finally:
+        limiter.release()
+
+
+def _throttled(limiter: ProviderLimiter, response, attempt: int) -> float:
+    floor = retry_after(response)
+    if floor is not None:
+        limiter.pause(floor)
+    delay = backoff(attempt, floor)
+    limiter._count("retries")
+    logging.warning(f"[ADMISSION] {limiter.name} returned {response.status_code}, retrying in {delay:.2f}s")
+    return delay
+
+
+# === Admitted Requests ===
+# Drop-in for http_pool.stream / http_pool.post. 429 and 503 answers are retried (before any
+# body is read) up to UPSTREAM_MAX_RETRIES times; the last one is returned to the caller.
+@asynccontextmanager
+async def stream(provider: str, method: str, url: str, cost: int = 1, **kwargs):
+    async with _slot(provider, cost) as limiter:
+        for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+            async with http_pool.stream(method, url, **kwargs) as response:
+                if response.status_code not in RETRY_STATUSES or attempt == UPSTREAM_MAX_RETRIES:
+                    yield response
+                    return
+                delay = _throttled(limiter, response, attempt)
+            await asyncio.sleep(delay)
+
+
+async def post(provider: str, url: str, cost: int = 1, **kwargs):
+    async with _slot(provider, cost) as limiter:
+        for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+            response = await http_pool.post(url, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == UPSTREAM_MAX_RETRIES:
+                return response
+            await asyncio.sleep(_throttled(limiter, response, attempt))
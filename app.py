@@ -1,104 +1,211 @@
 import os
-import asyncio
+import json
+import base64
 import logging
 import time
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from dotenv import load_dotenv
+from io import BytesIO
+from urllib.parse import quote
+from quart import Blueprint, Response, request, jsonify, abort
+from quart.formparser import FormDataParser
 
+import config  # loads .env before the modules below read their settings
+import admission
 from stt import transcribe_audio
-from tts import play_tts_stream
-from llm import ask_gpt
-from llm_gemini import ask_gemini
-
-# === Load env vars ===
-load_dotenv()
-
-# === Setup Flask + Logging ===
-app = Flask(__name__)
-CORS(app)
-
-logging.basicConfig(
-    filename='app.log',
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
+from tts_stream import stream_tts
+from llm import ask_gpt, AZURE_OPENAI_DEPLOYMENT, GPT_SAMPLING
+from llm_gemini import ask_gemini, GEMINI_MODEL, GEMINI_SAMPLING
+import llm_cache
+import llm_hedge
+from llm_hedge import ask_hedged, HEDGED_MODEL
+
+# === REST API (served by the Quart app in server.py, on its event loop) ===
+api = Blueprint("api", __name__)
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+TTS_OUTPUT_FORMAT = "mp3_44100"
+TTS_MIMETYPE = "audio/mpeg"
+TTS_VOICE_SETTINGS = {
+    "stability": 0.3,
+    "similarity_boost": 0.7,
+    "style": 0,
+    "use_speaker_boost": True
+}
+
+@api.after_request
+async def add_cors_headers(response):
+    response.headers["Access-Control-Allow-Origin"] = "*"
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Cache-Control"
+    response.headers["Access-Control-Expose-Headers"] = "X-Transcript, X-Response-Text, X-Timing"
+    return response
+
+# Each REST client queues its upstream requests in its own fair-share lane, as a /ws/live
+# session does, so one client flooding the API cannot hold back the others
+@api.before_request
+async def set_admission_lane():
+    admission.session_key.set(f"rest:{request.remote_addr or id(request)}")
 
 # === LLM Selector ===
+# "hedged" asks Azure first and races the backup provider if Azure is slower than usual
 def get_llm_function(llm_name: str):
     llm_name = llm_name.lower().strip()
+    if llm_name == "hedged":
+        return ask_hedged
     return ask_gpt if llm_name == "openai" else ask_gemini
 
+# Model + sampling parameters that identify a provider's answer in the response cache
+def get_llm_cache_identity(llm_func):
+    if llm_func is ask_gpt:
+        return "openai", AZURE_OPENAI_DEPLOYMENT, GPT_SAMPLING
+    if llm_func is ask_hedged:
+        return "hedged", HEDGED_MODEL, {"openai": GPT_SAMPLING, "gemini": GEMINI_SAMPLING}
+    return "gemini", GEMINI_MODEL, GEMINI_SAMPLING
+
+async def ask_llm(llm_func, prompt: str, use_cache: bool):
+    provider, model, params = get_llm_cache_identity(llm_func)
+    return await llm_cache.ask(llm_func, prompt, provider, model, params, use_cache=use_cache)
+
+def cache_requested(value) -> bool:
+    if request.headers.get("Cache-Control", "").lower() == "no-cache":
+        return False
+    return str(value).lower() not in ("false", "0", "no")
+
+# "format": "json" returns the audio base64-encoded next to the timings;
+# anything else streams the audio back as it is synthesized
+def json_requested(value) -> bool:
+    if value:
+        return str(value).lower() == "json"
+    return request.accept_mimetypes.best == "application/json"
+
+# === In-memory uploads ===
+# Multipart file parts go to a BytesIO instead of a spooled temp file
+def in_memory_stream(total_content_length, content_type, filename, content_length):
+    return BytesIO()
+
+# Accepts multipart/form-data (field "audio") or a raw audio/* body with options in the query
+# string. Returns (audio bytes, mimetype, form options).
+async def read_upload():
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        abort(413)
+
+    if request.mimetype == "multipart/form-data":
+        parser = FormDataParser(max_content_length=MAX_UPLOAD_BYTES, stream_factory=in_memory_stream)
+        form, files = await parser.parse(request.body, request.mimetype, request.content_length, request.mimetype_params)
+        audio_file = files.get("audio")
+        if audio_file is None:
+            return None, None, form
+        return audio_file.stream.getvalue(), audio_file.mimetype or "audio/wav", form
+
+    audio = bytearray()
+    async for chunk in request.body:
+        audio += chunk
+        if len(audio) > MAX_UPLOAD_BYTES:
+            abort(413)
+    return bytes(audio), request.mimetype or "audio/wav", request.args
+
+# === Shared response builder ===
+async def speak(label: str, response: str, timing: dict, start: float, as_json: bool, extra: dict):
+    tts_start = time.perf_counter()
+    audio = stream_tts(response, output_format=TTS_OUTPUT_FORMAT, voice_settings=TTS_VOICE_SETTINGS)
+
+    if as_json:
+        audio_bytes = b"".join([chunk async for chunk in audio])
+        timing["tts"] = round(time.perf_counter() - tts_start, 2)
+        timing["total"] = round(time.perf_counter() - start, 2)
+        return jsonify({
+            **extra,
+            "response": response,
+            "audio": base64.b64encode(audio_bytes).decode(),
+            "audio_format": TTS_OUTPUT_FORMAT,
+            "timing": timing
+        })
+
+    # Pull the first chunk up front so TTS failures still produce a JSON error
+    first_chunk = await anext(audio, b"")
+    timing["tts_first_byte"] = round(time.perf_counter() - tts_start, 2)
+
+    async def body():
+        yield first_chunk
+        async for chunk in audio:
+            yield chunk
+        logging.info(f"[{label}] Streamed audio in {time.perf_counter() - tts_start:.2f}s (total {time.perf_counter() - start:.2f}s)")
+
+    headers = {
+        "X-Response-Text": quote(response),
+        "X-Timing": json.dumps(timing),
+        **{f"X-{key.title()}": quote(value) for key, value in extra.items()}
+    }
+    return Response(body(), mimetype=TTS_MIMETYPE, headers=headers)
+
 # === /api/text ===
-@app.route("/api/text", methods=["POST"])
-def handle_text():
-    data = request.json
+@api.route("/api/text", methods=["POST"])
+async def handle_text():
+    data = await request.get_json()
     prompt = data.get("prompt", "")
     llm_name = data.get("llm", "openai")
     llm_func = get_llm_function(llm_name)
+    use_cache = cache_requested(data.get("cache", True))
 
     logging.info(f"[TEXT] Received: {prompt} | LLM: {llm_name}")
 
     try:
         start = time.perf_counter()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        response, llm_time = loop.run_until_complete(llm_func(prompt))
-        tts_time = play_tts_stream(response)
-        total_time = time.perf_counter() - start
-
-        return jsonify({
-            "response": response,
-            "timing": {
-                "stt": 0.0,
-                "llm": round(llm_time, 2),
-                "tts": round(tts_time, 2),
-                "total": round(total_time, 2)
-            }
-        })
+        response, llm_time, llm_cache_status = await ask_llm(llm_func, prompt, use_cache)
+        timing = {
+            "stt": 0.0,
+            "llm": round(llm_time, 2),
+            "llm_cache": llm_cache_status
+        }
+        return await speak("TEXT", response, timing, start, json_requested(data.get("format")), {})
 
     except Exception as e:
         logging.exception("[TEXT] Error")
         return jsonify({"error": str(e)}), 500
 
 # === /api/audio ===
-@app.route("/api/audio", methods=["POST"])
-def handle_audio():
-    audio_file = request.files.get("audio")
-    llm_name = request.form.get("llm", "openai")
+@api.route("/api/audio", methods=["POST"])
+async def handle_audio():
+    audio, mimetype, form = await read_upload()
+    if not audio:
+        return jsonify({"error": "No audio uploaded."}), 400
+    llm_name = form.get("llm", "openai")
     llm_func = get_llm_function(llm_name)
+    use_cache = cache_requested(form.get("cache", True))
 
-    audio_path = "temp.wav"
-    audio_file.save(audio_path)
-    logging.info(f"[AUDIO] Received audio | LLM: {llm_name}")
+    logging.info(f"[AUDIO] Received {len(audio)} bytes of {mimetype} | LLM: {llm_name}")
 
     try:
         start = time.perf_counter()
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        transcript, stt_time = loop.run_until_complete(transcribe_audio(audio_path))
-        response, llm_time = loop.run_until_complete(llm_func(transcript))
-        tts_time = play_tts_stream(response)
-        total_time = time.perf_counter() - start
-
-        return jsonify({
-            "transcript": transcript,
-            "response": response,
-            "timing": {
-                "stt": round(stt_time, 2),
-                "llm": round(llm_time, 2),
-                "tts": round(tts_time, 2),
-                "total": round(total_time, 2)
-            }
-        })
+        transcript, stt_time = await transcribe_audio(audio, mimetype)
+        response, llm_time, llm_cache_status = await ask_llm(llm_func, transcript, use_cache)
+        timing = {
+            "stt": round(stt_time, 2),
+            "llm": round(llm_time, 2),
+            "llm_cache": llm_cache_status
+        }
+        return await speak("AUDIO", response, timing, start, json_requested(form.get("format")), {"transcript": transcript})
 
     except Exception as e:
         logging.exception("[AUDIO] Error")
         return jsonify({"error": str(e)}), 500
 
+# === /stats/llm-cache ===
+@api.route("/stats/llm-cache", methods=["GET"])
+async def llm_cache_stats():
+    return jsonify(llm_cache.cache_stats())
+
+# === /stats/llm-hedge ===
+@api.route("/stats/llm-hedge", methods=["GET"])
+async def llm_hedge_stats():
+    return jsonify(llm_hedge.hedge_stats())
+
 # === Run Server ===
+# The API is mounted on the live-conversation app, so both share one process and event loop
 if __name__ == "__main__":
-    logging.info("🚀 Starting Flask server...")
-    app.run(debug=True)
+    import uvicorn
+    import logs
+    from server import app
+    # Started this way the REST API has always logged to app.log
+    logs.setup(handlers=[logs.default_handler(logs.LOG_FILE or "app.log")])
+    logging.info("🚀 Starting API server...")
+    uvicorn.run(app, host="0.0.0.0", port=5000)
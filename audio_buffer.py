@@ -0,0 +1,126 @@
+import os
+import asyncio
+import logging
+from collections import deque
+
+import metrics
+
+# === Inbound Audio Config ===
+# Frames waiting to go to Deepgram are bounded by count and bytes. When full, the policy decides:
+#   block       - stop reading the client socket until there is room (TCP backpressure)
+#   drop_oldest - discard the oldest queued frame
+#   coalesce    - merge into the newest queued frame until the byte cap, then drop oldest
+AUDIO_QUEUE_MAX_FRAMES = int(os.getenv("AUDIO_QUEUE_MAX_FRAMES", "50"))
+AUDIO_QUEUE_MAX_BYTES = int(os.getenv("AUDIO_QUEUE_MAX_BYTES", str(512 * 1024)))
+AUDIO_OVERFLOW_POLICY = os.getenv("AUDIO_OVERFLOW_POLICY", "coalesce")
+OVERFLOW_POLICIES = ("block", "drop_oldest", "coalesce")
+
+# Sends to Deepgram are batched to this much audio (raw PCM only; container formats such as
+# WebM/Opus carry no fixed byte rate, so whatever is queued goes out together)
+AUDIO_BATCH_MS = int(os.getenv("AUDIO_BATCH_MS", "40"))
+AUDIO_BATCH_MAX_MS = int(os.getenv("AUDIO_BATCH_MAX_MS", "100"))
+AUDIO_BATCH_MAX_BYTES = int(os.getenv("AUDIO_BATCH_MAX_BYTES", str(64 * 1024)))
+# Real-time frames land right on the deadline; allow a little arrival jitter
+AUDIO_BATCH_JITTER = 0.005
+
+
+class InboundAudioBuffer:
+    def __init__(self, bytes_per_second: int = None, policy: str = AUDIO_OVERFLOW_POLICY,
+                 max_frames: int = AUDIO_QUEUE_MAX_FRAMES, max_bytes: int = AUDIO_QUEUE_MAX_BYTES):
+        if policy not in OVERFLOW_POLICIES:
+            logging.warning(f"[AUDIO] Unknown overflow policy '{policy}', using block")
+            policy = "block"
+        self.policy = policy
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.bytes_per_second = bytes_per_second
+        if bytes_per_second:
+            self.batch_bytes = bytes_per_second * AUDIO_BATCH_MS // 1000 // 2 * 2
+            self.batch_max_bytes = bytes_per_second * AUDIO_BATCH_MAX_MS // 1000 // 2 * 2
+        else:
+            self.batch_bytes = 0
+            self.batch_max_bytes = AUDIO_BATCH_MAX_BYTES
+        self._frames = deque()
+        self._bytes = 0
+        self._data = asyncio.Event()
+        self._space = asyncio.Event()
+        self.stats = {"frames_received": 0, "frames_dropped": 0, "bytes_dropped": 0, "frames_coalesced": 0,
+                      "blocked": 0, "sends": 0, "bytes_sent": 0, "max_depth": 0}
+
+    def _count(self, name: str, value: int = 1):
+        self.stats[name] += value
+        metrics.incr(f"audio_inbound_{name}", value)
+
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def _full(self) -> bool:
+        return len(self._frames) >= self.max_frames or self._bytes >= self.max_bytes
+
+    def _drop_oldest(self):
+        frame = self._frames.popleft()
+        self._bytes -= len(frame)
+        self._count("frames_dropped")
+        self._count("bytes_dropped", len(frame))
+
+    async def put(self, frame: bytes):
+        self._count("frames_received")
+        while self._full():
+            if self.policy == "block":
+                self._count("blocked")
+                self._space.clear()
+                await self._space.wait()
+                continue
+            if self.policy == "coalesce" and self._frames and self._bytes + len(frame) <= self.max_bytes:
+                tail = self._frames[-1]
+                if not isinstance(tail, bytearray):
+                    tail = self._frames[-1] = bytearray(tail)
+                tail += frame
+                self._bytes += len(frame)
+                self._count("frames_coalesced")
+                self._data.set()
+                return
+            self._drop_oldest()
+        self._frames.append(frame)
+        self._bytes += len(frame)
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self._frames))
+        self._data.set()
+
+    def _take(self, limit: int, batch: bytearray):
+        # Whole frames only; an oversized frame still goes out on its own
+        while self._frames and (not batch or len(batch) + len(self._frames[0]) <= limit):
+            frame = self._frames.popleft()
+            self._bytes -= len(frame)
+            batch += frame
+        self._space.set()
+
+    # One send's worth of audio: everything queued up to the batch limit, and for raw PCM,
+    # waits just long enough for the batch to reach its target duration.
+    async def get(self) -> bytes:
+        while not self._frames:
+            self._data.clear()
+            await self._data.wait()
+        batch = bytearray()
+        self._take(self.batch_max_bytes, batch)
+
+        if self.bytes_per_second:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + (self.batch_bytes - len(batch)) / self.bytes_per_second + AUDIO_BATCH_JITTER
+            # Frames still queued after a take did not fit, so the batch is as full as it gets
+            while len(batch) < self.batch_bytes and not self._frames:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._data.clear()
+                try:
+                    await asyncio.wait_for(self._data.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._take(self.batch_max_bytes, batch)
+
+        self._count("sends")
+        self._count("bytes_sent", len(batch))
+        return bytes(batch)
+
+    def summary(self) -> dict:
+        return {"policy": self.policy, "depth": len(self._frames), "queued_bytes": self._bytes, **self.stats}
@@ -0,0 +1,54 @@
+import os
+import struct
+
+# === Output Formats ===
+# Negotiated per /ws/live connection with ?format=. Each maps to the ElevenLabs output_format,
+# the mimetype the client should decode, and the byte alignment a frame must keep.
+OUTPUT_FORMATS = {
+    "mp3": {"elevenlabs": "mp3_44100", "mimetype": "audio/mpeg", "align": 1},
+    "pcm": {"elevenlabs": "pcm_16000", "mimetype": "audio/pcm;rate=16000;encoding=s16le", "align": 2},
+    "opus": {"elevenlabs": "opus_48000_64", "mimetype": "audio/ogg;codecs=opus", "align": 1},
+}
+DEFAULT_OUTPUT_FORMAT = os.getenv("DEFAULT_OUTPUT_FORMAT", "mp3")
+AUDIO_FRAME_BYTES = int(os.getenv("AUDIO_FRAME_BYTES", "4096"))
+
+# === Frame Header ===
+# turn id (uint32), sequence number within the turn (uint32), flags (uint8), network order.
+# The final frame of a turn carries FLAG_FINAL and whatever audio was still held back.
+FRAME_HEADER = struct.Struct("!IIB")
+FLAG_FINAL = 0x01
+
+
+def format_announcement(name: str) -> dict:
+    spec = OUTPUT_FORMATS[name]
+    return {"type": "format", "format": name, "mimetype": spec["mimetype"], "header_bytes": FRAME_HEADER.size}
+
+
+# === Per-turn Framer ===
+# Upstream chunks are cut into frames of at most frame_bytes through memoryview slices, so the
+# only copy is the one that joins header and payload into the outgoing message. PCM keeps
+# sample alignment by carrying a trailing odd byte into the next chunk.
+class AudioFramer:
+    def __init__(self, turn_id: int, output_format: str, frame_bytes: int = AUDIO_FRAME_BYTES):
+        self.turn_id = turn_id
+        self.align = OUTPUT_FORMATS[output_format]["align"]
+        self.frame_bytes = frame_bytes - frame_bytes % self.align
+        self.seq = 0
+        self.bytes_sent = 0
+        self._carry = b""
+
+    def frames(self, chunk: bytes) -> list[bytes]:
+        data = memoryview(self._carry + chunk if self._carry else chunk)
+        usable = len(data) - len(data) % self.align
+        self._carry = bytes(data[usable:])
+        return [self._frame(data[i:min(i + self.frame_bytes, usable)])
+                for i in range(0, usable, self.frame_bytes)]
+
+    def final(self) -> bytes:
+        return self._frame(memoryview(self._carry), FLAG_FINAL)
+
+    def _frame(self, payload: memoryview, flags: int = 0) -> bytes:
+        frame = FRAME_HEADER.pack(self.turn_id, self.seq, flags) + payload
+        self.seq += 1
+        self.bytes_sent += len(frame)
+        return frame
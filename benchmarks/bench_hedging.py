@@ -0,0 +1,82 @@
+# Simulates heavy-tailed provider latency and compares plain primary calls with hedged calls.
+# Providers are replaced in-process; only llm_hedge's race and adaptive threshold are exercised.
+# Run from the repo root: python -m benchmarks.bench_hedging [requests] [concurrency]
+import sys
+import time
+import random
+import asyncio
+
+import metrics
+from llm import GPT_FAILED
+from llm_hedge import Hedger
+
+# Most answers arrive in ~0.6s; a few stall for several seconds and some fail outright
+STRAGGLER_RATE = 0.05
+FAILURE_RATE = 0.01
+
+
+def sample_latency() -> float:
+    if random.random() < STRAGGLER_RATE:
+        return random.uniform(3.0, 8.0)
+    return random.lognormvariate(-0.5, 0.25)
+
+
+async def fake_provider(prompt: str) -> tuple[str, float]:
+    latency = sample_latency()
+    await asyncio.sleep(latency)
+    if random.random() < FAILURE_RATE:
+        return GPT_FAILED, 0.0
+    return f"answer to {prompt}", latency
+
+
+async def fake_stream():
+    await asyncio.sleep(sample_latency())
+    for token in ("Hello", " there", "."):
+        yield token
+        await asyncio.sleep(0.01)
+
+
+async def run(label: str, make_call, requests: int, concurrency: int) -> list[float]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int) -> float:
+        async with slots:
+            start = time.perf_counter()
+            await make_call(i)
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*[timed(i) for i in range(requests)])
+    print(f"  {label:<16} p50={metrics.quantile(latencies, 0.5):.2f}s p95={metrics.quantile(latencies, 0.95):.2f}s "
+          f"p99={metrics.quantile(latencies, 0.99):.2f}s max={max(latencies):.2f}s")
+    return latencies
+
+
+async def collect(stream) -> str:
+    return "".join([token async for token in stream])
+
+
+async def main(requests: int, concurrency: int):
+    random.seed(7)
+    print(f"{requests} requests, {concurrency} at a time, {STRAGGLER_RATE:.0%} stragglers:")
+    plain = await run("primary only", lambda i: fake_provider(f"q{i}"), requests, concurrency)
+
+    rest = Hedger("bench_rest")
+    hedged = await run("hedged ask", lambda i: rest.ask(fake_provider, fake_provider, f"q{i}"), requests, concurrency)
+
+    live = Hedger("bench_live")
+    streamed = await run("hedged stream", lambda i: collect(live.stream(fake_stream, fake_stream)), requests, concurrency)
+
+    for label, hedger in (("ask", rest), ("stream", live)):
+        stats = hedger.stats()
+        print(f"  {label}: threshold={stats['threshold']:.2f}s hedge_rate={stats['hedge_rate']:.1%} "
+              f"backup_wins={stats['backup_wins']} primary_failures={stats['primary_failures']}")
+    saved = metrics.quantile(plain, 0.99) - metrics.quantile(hedged, 0.99)
+    print(f"  p99 saved by hedging: {saved:.2f}s (ask), "
+          f"{metrics.quantile(plain, 0.99) - metrics.quantile(streamed, 0.99):.2f}s (stream)")
+    return saved > 0
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    parallel = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    sys.exit(0 if asyncio.run(main(count, parallel)) else 1)
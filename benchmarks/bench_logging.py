@@ -0,0 +1,117 @@
+# Simulates concurrent /ws/live turns streaming LLM tokens and measures how much event-loop
+# time goes into logging, the old way (basicConfig: a synchronous handler on the root logger
+# and one INFO line per token) against logs.setup (a queue to a writer thread and one line
+# per turn). The handler writes to a temp file; a second pass adds a per-write delay to stand
+# in for a slow or contended disk. Reports logging time per turn and event-loop lag.
+# Run from the repo root: python -m benchmarks.bench_logging [sessions] [turns]
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+
+import logs
+import metrics
+
+TOKENS_PER_TURN = 60
+TOKEN_INTERVAL = 0.002
+TOKEN = " word"
+
+
+class SlowFileHandler(logging.FileHandler):
+    def __init__(self, path: str, delay: float):
+        super().__init__(path, encoding="utf-8")
+        self.write_delay = delay
+
+    def emit(self, record):
+        super().emit(record)
+        if self.write_delay:
+            time.sleep(self.write_delay)
+
+
+def configure(mode: str, path: str, delay: float):
+    logs.shutdown()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    handler = SlowFileHandler(path, delay)
+    if mode == "sync":
+        handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        handler.setFormatter(logs.TextFormatter())
+        logs.setup("INFO", handlers=[handler])
+
+
+# One turn as server.respond_to_audio logs it; spent[0] collects time inside logging calls
+async def turn(session: int, turn_id: int, per_token: bool, spent: list):
+    logs.session_id.set(f"s{session}")
+    logs.turn_id.set(turn_id)
+    reply = []
+    log_tokens = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for _ in range(TOKENS_PER_TURN):
+        await asyncio.sleep(TOKEN_INTERVAL)
+        reply.append(TOKEN)
+        start = time.perf_counter()
+        if per_token:
+            logging.info(f"💬 openai: {TOKEN.strip()}")
+        elif log_tokens:
+            logging.debug(f"💬 openai: {TOKEN.strip()}")
+        spent[0] += time.perf_counter() - start
+    start = time.perf_counter()
+    logging.info(f"💬 openai: {''.join(reply).strip()}", extra={"fields": {"tokens": len(reply)}})
+    spent[0] += time.perf_counter() - start
+
+
+async def session_turns(session: int, turns: int, per_token: bool, spent: list):
+    for turn_id in range(1, turns + 1):
+        await turn(session, turn_id, per_token, spent)
+
+
+async def watch_lag(lags: list, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def scenario(label: str, mode: str, per_token: bool, sessions: int, turns: int, delay: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.log")
+        configure(mode, path, delay)
+        spent, lags = [0.0], []
+        watcher = asyncio.create_task(watch_lag(lags))
+        await asyncio.gather(*(session_turns(s, turns, per_token, spent) for s in range(sessions)))
+        watcher.cancel()
+        # Drains the queue, so the line count below is complete
+        logs.shutdown()
+        for handler in logging.getLogger().handlers[:]:
+            handler.close()
+        with open(path, encoding="utf-8") as f:
+            lines = sum(1 for _ in f)
+    print(f"  {label:<30} {spent[0] / (sessions * turns) * 1000:7.3f}ms in logging per turn  "
+          f"lines={lines:<6} loop lag p99={metrics.quantile(lags, 0.99) * 1000:6.1f}ms")
+    return spent[0]
+
+
+async def main(sessions: int, turns: int):
+    print(f"{sessions} sessions x {turns} turns of {TOKENS_PER_TURN} tokens:")
+    results = {}
+    for delay in (0.0, 0.0005):
+        print(f" file handler, {delay * 1000:g}ms extra per write:")
+        before = await scenario("sync, line per token (before)", "sync", True, sessions, turns, delay)
+        await scenario("queue, line per token", "queue", True, sessions, turns, delay)
+        after = await scenario("queue, line per turn (after)", "queue", False, sessions, turns, delay)
+        print(f"  event-loop logging time: {before / after:.0f}x less")
+        results[delay] = before > after
+    return all(results.values())
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    sys.exit(0 if asyncio.run(main(count, rounds)) else 1)
@@ -0,0 +1,130 @@
+# Drives voice.py's microphone path from a fake audio thread, faster than real time, and
+# compares the old callback (one create_task + ws.send coroutine per block) with
+# capture.CaptureRing and its single sender. Reports process CPU per second of captured
+# audio, tasks created, peak concurrent sends and ring overruns, on a steady socket and on
+# one that stalls every STALL_EVERY seconds (scaled by the speedup) for a short stall the ring
+# absorbs and for one longer than the ring holds.
+# Run from the repo root: python -m benchmarks.bench_mic_capture [audio_seconds] [speedup]
+import sys
+import math
+import time
+import asyncio
+from array import array
+
+from capture import CaptureRing, MIC_SAMPLE_RATE, MIC_BLOCK_SAMPLES
+from turn_detection import EnergyVAD
+
+BLOCK_SECONDS = MIC_BLOCK_SAMPLES / MIC_SAMPLE_RATE
+STALL_EVERY = 5.0
+STALLS = (0.5, 3.0)
+
+
+def speech_blocks(count: int) -> list[bytes]:
+    # Alternating 1 s of tone and 1 s of near-silence, so the VAD both sends and drops
+    blocks = []
+    for b in range(count):
+        loud = int(b * BLOCK_SECONDS) % 2 == 0
+        amplitude = 3000 if loud else 20
+        start = b * MIC_BLOCK_SAMPLES
+        blocks.append(array("h", (int(amplitude * math.sin(2 * math.pi * 220 * (start + i) / MIC_SAMPLE_RATE))
+                                  for i in range(MIC_BLOCK_SAMPLES))).tobytes())
+    return blocks
+
+
+# A send waits out any stall in progress, as a full socket buffer makes ws.send wait on drain
+class FakeSocket:
+    def __init__(self, stall_seconds: float, speedup: float):
+        self.stall_seconds = stall_seconds / speedup
+        self.stall_every = STALL_EVERY / speedup
+        self.started = time.perf_counter()
+        self.closed = False
+        self.sends = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def send(self, data: bytes):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        phase = (time.perf_counter() - self.started) % self.stall_every
+        if phase < self.stall_seconds:
+            await asyncio.sleep(self.stall_seconds - phase)
+        self.sends += 1
+        self.in_flight -= 1
+
+
+# Stands in for sounddevice's audio thread, calling back once per block
+def audio_thread(callback, blocks: list[bytes], speedup: float):
+    interval = BLOCK_SECONDS / speedup
+    next_at = time.perf_counter()
+    for block in blocks:
+        callback(block, MIC_BLOCK_SAMPLES, None, None)
+        next_at += interval
+        time.sleep(max(next_at - time.perf_counter(), 0))
+
+
+async def run_legacy(blocks, speedup, ws, use_vad):
+    loop = asyncio.get_running_loop()
+    vad = EnergyVAD(MIC_SAMPLE_RATE)
+    tasks = [0]
+
+    def callback(indata, frames, t, status):
+        if not ws.closed:
+            for frame in (vad.process(bytes(indata)) if use_vad else [bytes(indata)]):
+                tasks[0] += 1
+                loop.call_soon_threadsafe(asyncio.create_task, ws.send(frame))
+
+    await asyncio.to_thread(audio_thread, callback, blocks, speedup)
+    while ws.in_flight:
+        await asyncio.sleep(0.01)
+    return {"tasks": tasks[0]}
+
+
+async def run_ring(blocks, speedup, ws, use_vad):
+    loop = asyncio.get_running_loop()
+    vad = EnergyVAD(MIC_SAMPLE_RATE)
+    ring = CaptureRing(loop)
+
+    async def forward():
+        while (batch := await ring.get()) is not None:
+            frames = vad.process(batch) if use_vad else [batch]
+            if frames:
+                await ws.send(b"".join(frames))
+
+    sender = asyncio.create_task(forward())
+    await asyncio.to_thread(audio_thread, lambda indata, frames, t, status: ring.write(indata, status), blocks, speedup)
+    ring.close()
+    await sender
+    stats = ring.summary()
+    return {"tasks": 1, "overruns": stats["overruns"]}
+
+
+async def measure(label, run, blocks, speedup, stall_seconds, use_vad):
+    ws = FakeSocket(stall_seconds, speedup)
+    cpu, wall = time.process_time(), time.perf_counter()
+    result = await run(blocks, speedup, ws, use_vad)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    audio_seconds = len(blocks) * BLOCK_SECONDS
+    print(f"  {label:<8} {cpu / audio_seconds * 1000:6.2f}ms CPU per audio second  tasks={result['tasks']:<5} "
+          f"sends={ws.sends:<5} peak concurrent sends={ws.peak_in_flight:<4} overruns={result.get('overruns', '-')}")
+    return cpu / audio_seconds
+
+
+async def main(audio_seconds: float, speedup: float):
+    blocks = speech_blocks(int(audio_seconds / BLOCK_SECONDS))
+    print(f"{len(blocks)} blocks of {MIC_BLOCK_SAMPLES} samples ({audio_seconds:.0f}s of audio) at {speedup:g}x real time:")
+    ratios = []
+    for use_vad in (False, True):
+        for stall in (0.0, *STALLS):
+            socket = f"{stall * 1000:g}ms stall every {STALL_EVERY:g}s" if stall else "steady socket"
+            print(f" VAD {'on' if use_vad else 'off'}, {socket}:")
+            legacy = await measure("callback", run_legacy, blocks, speedup, stall, use_vad)
+            ring = await measure("ring", run_ring, blocks, speedup, stall, use_vad)
+            ratios.append(legacy / ring)
+    print(f"  CPU ratio callback/ring: {', '.join(f'{r:.2f}x' for r in ratios)}")
+    return True
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60
+    factor = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sys.exit(0 if asyncio.run(main(seconds, factor)) else 1)
@@ -0,0 +1,84 @@
+# Feeds simulated TTS output (sentences streamed in small chunks with jittery arrival) into
+# playback.PlaybackEngine on a real-time null sink, as voice.py does, and reports underruns,
+# time spent starved, barge-in flush latency and event-loop lag while audio plays.
+# Run from the repo root: python -m benchmarks.bench_playback [answers]
+import sys
+import time
+import random
+import asyncio
+
+import metrics
+from playback import PlaybackEngine, NullSink
+
+SAMPLE_RATE = 16000
+CHUNK_BYTES = 2048  # ~64 ms, about what ElevenLabs pcm_16000 chunks carry
+
+
+# Synthesis of each sentence starts late by a random first-byte time, then streams faster
+# than real time, like a TTS pipeline running a sentence or two ahead
+async def speak_answer(engine: PlaybackEngine, sentences: int, first_byte_ms: float, realtime_factor: float):
+    for _ in range(sentences):
+        await asyncio.sleep(random.expovariate(1000 / first_byte_ms))
+        audio = bytes(int(SAMPLE_RATE * 2 * random.uniform(0.8, 2.0)) // 2 * 2)
+        for i in range(0, len(audio), CHUNK_BYTES):
+            await engine.feed(audio[i:i + CHUNK_BYTES])
+            await asyncio.sleep(CHUNK_BYTES / (SAMPLE_RATE * 2) / realtime_factor)
+    await engine.drained()
+
+
+async def watch_lag(lags: list, interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def scenario(label: str, answers: int, first_byte_ms: float, realtime_factor: float, **engine_args):
+    engine = PlaybackEngine(SAMPLE_RATE, NullSink(), **engine_args)
+    lags = []
+    watcher = asyncio.create_task(watch_lag(lags))
+    start = time.perf_counter()
+    for _ in range(answers):
+        await speak_answer(engine, 3, first_byte_ms, realtime_factor)
+    wall = time.perf_counter() - start
+    watcher.cancel()
+    stats = engine.stats()
+    engine.close()
+    audio_seconds = stats["bytes_played"] / (SAMPLE_RATE * 2)
+    print(f"  {label:<34} {audio_seconds:5.1f}s audio in {wall:5.1f}s  underruns={stats['underruns']:<3} "
+          f"starved={stats['starved_seconds'] * 1000:6.0f}ms  max_buffered={stats['max_buffered_ms']:5.0f}ms  "
+          f"loop lag p99={metrics.quantile(lags, 0.99) * 1000:.1f}ms")
+    return stats
+
+
+async def flush_latency(rounds: int = 20) -> list[float]:
+    engine = PlaybackEngine(SAMPLE_RATE, NullSink())
+    latencies = []
+    for _ in range(rounds):
+        engine.write(bytes(SAMPLE_RATE * 2))
+        await asyncio.sleep(random.uniform(0.05, 0.2))
+        start = time.perf_counter()
+        engine.flush()
+        engine.drain()
+        latencies.append(time.perf_counter() - start)
+    engine.close()
+    return latencies
+
+
+async def main(answers: int):
+    random.seed(5)
+    print(f"{answers} answers of 3 sentences each, real-time null sink:")
+    steady = await scenario("fast TTS (150ms first byte, 4x)", answers, 150, 4.0)
+    await scenario("slow TTS (600ms first byte, 1.2x)", answers, 600, 1.2)
+    await scenario("slow TTS, 300ms preroll", answers, 600, 1.2, preroll_ms=300)
+    await scenario("fast TTS, 200ms buffer cap", answers, 150, 4.0, buffer_ms=200)
+    latencies = await flush_latency()
+    print(f"  flush to silence: p50={metrics.quantile(latencies, 0.5) * 1000:.1f}ms "
+          f"max={max(latencies) * 1000:.1f}ms")
+    return steady["bytes_played"] > 0 and max(latencies) < 0.1
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    sys.exit(0 if asyncio.run(main(count)) else 1)
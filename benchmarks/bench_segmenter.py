@@ -0,0 +1,137 @@
+# Segmenter corpus check + chunking benchmark
+# Run from the repo root: python -m benchmarks.bench_segmenter
+import re
+import sys
+
+from segmenter import SentenceSegmenter
+
+# === Simulation Model ===
+TOKEN_MS = 25              # ~40 tokens/s from the LLM once streaming
+TTS_OVERHEAD_MS = 250      # per-request ElevenLabs first-byte cost
+TTS_MS_PER_CHAR = 1.5      # first-byte latency grows slightly with text length
+
+# === Corpus: (streamed text, expected chunks) ===
+CORPUS = [
+    ("Sure! The price is $3.50 today. Dr. Smith said e.g. apples are fine. Is that OK? Yes!",
+     ["Sure!", "The price is $3.50 today. Dr. Smith said e.g. apples are fine.", "Is that OK? Yes!"]),
+    ("No. I don't think so, but let me check the schedule for you right now.",
+     ["No.", "I don't think so, but let me check the schedule for you right now."]),
+    ("Well, I think the best approach here, honestly, is to wait until the U.S. market opens at 9 a.m. and then decide.",
+     ["Well, I think the best approach here,",
+      "honestly, is to wait until the U.S. market opens at 9 a.m. and then decide."]),
+    ("The capital of France is Paris. It has about 2.1 million residents. It is known for the Eiffel Tower, "
+     "the Louvre, and its cafés. Would you like to know more? I can share history, food, or travel tips.",
+     ["The capital of France is Paris.",
+      "It has about 2.1 million residents. It is known for the Eiffel Tower, the Louvre, and its cafés.",
+      "Would you like to know more? I can share history, food, or travel tips."]),
+    ("He said \"stop!\" and left. Mr. J. R. Smith agreed.",
+     ["He said \"stop!\"", "and left. Mr. J. R. Smith agreed."]),
+    ("Version 2.0 ships on Jan. 5 with 1,000 new features",
+     ["Version 2.0 ships on Jan. 5 with 1,000 new features"]),
+    ("Here are the steps:\n1. Open the settings page.\n2. Choose security, then reset your password.\n3. Enter the code.",
+     ["Here are the steps:\n1. Open the settings page.", "2. Choose security, then reset your password.",
+      "3. Enter the code."]),
+    ("Hmm...", ["Hmm..."]),
+    ("Supercalifragilisticexpialidocious " * 4,
+     ["Supercalifragilisticexpialidocious Supercalifragilisticexpialidocious",
+      "Supercalifragilisticexpialidocious Supercalifragilisticexpialidocious"]),
+]
+
+BENCH_TEXTS = [text for text, _ in CORPUS[:5]] + [
+    "Absolutely. To reset your password, open the settings page and choose security. Then select reset password, "
+    "enter the code we text you, and pick a new password with at least twelve characters. If the code does not "
+    "arrive within five minutes, you can request another one. Is there anything else I can help you with today?",
+    "Great question! Photosynthesis is the process plants use to turn light into chemical energy. Chlorophyll in "
+    "the leaves absorbs sunlight, which drives a reaction that combines carbon dioxide and water into glucose. "
+    "Oxygen is released as a by-product, which is why forests matter so much for the air we breathe. Plants "
+    "store the glucose as starch and use it for growth. Would you like a simple diagram of the cycle?",
+]
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"\s?[^\s]{1,4}|\s+", text)
+
+
+# === Strategies ===
+def segment_streaming(text: str) -> list[tuple[int, str]]:
+    segmenter = SentenceSegmenter()
+    chunks = []
+    for i, token in enumerate(tokenize(text)):
+        chunks += [(i, chunk) for chunk in segmenter.feed(token)]
+    if (rest := segmenter.flush()):
+        chunks.append((len(tokenize(text)) - 1, rest))
+    return chunks
+
+
+def segment_legacy_server(text: str) -> list[tuple[int, str]]:
+    # server.py / voice.py before the shared segmenter
+    chunks, buffer = [], ""
+    for i, token in enumerate(tokenize(text)):
+        buffer += token
+        if buffer.endswith(".") or len(buffer) > 80:
+            chunks.append((i, buffer))
+            buffer = ""
+    if buffer:
+        chunks.append((len(tokenize(text)) - 1, buffer))
+    return chunks
+
+
+def segment_legacy_agent(text: str) -> list[tuple[int, str]]:
+    # streaming_agent.py before the shared segmenter
+    chunks, buffer = [], ""
+    for i, token in enumerate(tokenize(text)):
+        buffer += token
+        if len(buffer) >= 40 and buffer.strip().endswith("."):
+            chunks.append((i, buffer))
+            buffer = ""
+    if buffer.strip():
+        chunks.append((len(tokenize(text)) - 1, buffer))
+    return chunks
+
+
+STRATEGIES = {
+    "legacy endswith('.') or >80": segment_legacy_server,
+    "legacy >=40 and '.'": segment_legacy_agent,
+    "SentenceSegmenter": segment_streaming,
+}
+
+
+def check_corpus() -> bool:
+    ok = True
+    for text, expected in CORPUS:
+        for step in (1, 3, 7, len(text)):
+            segmenter = SentenceSegmenter()
+            got = []
+            for i in range(0, len(text), step):
+                got += segmenter.feed(text[i:i + step])
+            if (rest := segmenter.flush()):
+                got.append(rest)
+            if got != expected:
+                ok = False
+                print(f"FAIL (step={step}): {text[:50]!r}\n  expected {expected}\n  got      {got}")
+                break
+    print(f"Corpus: {'all' if ok else 'NOT all'} {len(CORPUS)} cases match")
+    return ok
+
+
+def benchmark():
+    print(f"\n{'strategy':<30} {'chunks':>7} {'avg chars':>10} {'1st chars':>10} {'1st emit ms':>12} {'est TTFA ms':>12} {'mid-word cuts':>14}")
+    for name, strategy in STRATEGIES.items():
+        chunks = firsts = avg = emit = ttfa = cuts = 0
+        for text in BENCH_TEXTS:
+            result = strategy(text)
+            first_index, first_text = result[0]
+            chunks += len(result)
+            avg += sum(len(c.strip()) for _, c in result) / len(result)
+            firsts += len(first_text.strip())
+            emit += (first_index + 1) * TOKEN_MS
+            ttfa += (first_index + 1) * TOKEN_MS + TTS_OVERHEAD_MS + len(first_text) * TTS_MS_PER_CHAR
+            cuts += sum(1 for _, c in result[:-1] if c and not c[-1].isspace() and c.strip()[-1].isalnum())
+        n = len(BENCH_TEXTS)
+        print(f"{name:<30} {chunks / n:>7.1f} {avg / n:>10.1f} {firsts / n:>10.1f} {emit / n:>12.0f} {ttfa / n:>12.0f} {cuts:>14}")
+
+
+if __name__ == "__main__":
+    passed = check_corpus()
+    benchmark()
+    sys.exit(0 if passed else 1)
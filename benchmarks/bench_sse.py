@@ -0,0 +1,107 @@
+# Compares the old aiter_lines() + json.loads token loop with sse.openai_deltas on a recorded-style
+# Azure stream, replayed through a real httpx.Response in randomly sized network chunks.
+# Reports tokens per second and memory. CPython has no allocation counter, so memory is the
+# tracemalloc peak while parsing the whole stream.
+# Run from the repo root: python -m benchmarks.bench_sse [tokens] [rounds]
+import sys
+import json
+import time
+import random
+import asyncio
+import tracemalloc
+
+import httpx
+
+import sse
+
+WORDS = "the quick brown fox jumps over a lazy dog while tides roll in".split()
+
+
+def azure_stream(tokens: int) -> bytes:
+    def event(choices):
+        return b"data: " + json.dumps({"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 1,
+                                       "model": "gpt-4o", "choices": choices}).encode() + b"\n\n"
+    body = [b'data: {"choices":[],"prompt_filter_results":[]}\n\n',
+            event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+    for i in range(tokens):
+        body.append(event([{"index": 0, "delta": {"content": " " + random.choice(WORDS)},
+                            "finish_reason": None, "content_filter_results": {}}]))
+    body.append(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+    body.append(b"data: [DONE]\n\n")
+    return b"".join(body)
+
+
+def network_chunks(body: bytes) -> list[bytes]:
+    chunks, i = [], 0
+    while i < len(body):
+        size = random.randint(200, 4096)
+        chunks.append(body[i:i + size])
+        i += size
+    return chunks
+
+
+def make_response(chunks: list[bytes]) -> httpx.Response:
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+    return httpx.Response(200, content=stream(), headers={"content-type": "text/event-stream"})
+
+
+# The parsing loop server.stream_gpt used before the sse module
+async def legacy_tokens(response):
+    async for line in response.aiter_lines():
+        if line.startswith("data: "):
+            try:
+                yield json.loads(line[6:])["choices"][0]["delta"].get("content", "")
+            except:
+                continue
+
+
+async def consume(tokens) -> int:
+    count = 0
+    async for token in tokens:
+        if token:
+            count += 1
+    return count
+
+
+async def measure(label: str, parse, chunks: list[bytes], rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        count = await consume(parse(make_response(chunks)))
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    await consume(parse(make_response(chunks)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {label:<24} {count / best:>10,.0f} tokens/s  peak {peak / 1024:6.1f} KiB  "
+          f"{peak / count:5.2f} peak bytes/token")
+    return count, count / best
+
+
+async def main(tokens: int, rounds: int):
+    random.seed(3)
+    chunks = network_chunks(azure_stream(tokens))
+    print(f"{tokens} tokens in {len(chunks)} network chunks, best of {rounds} (decoder: {sse.loads.__module__}):")
+    legacy_count, legacy_rate = await measure("aiter_lines+json", legacy_tokens, chunks, rounds)
+    count, rate = await measure("sse.openai_deltas", sse.openai_deltas, chunks, rounds)
+    fast_loads, sse.loads = sse.loads, json.loads
+    await measure("sse.openai_deltas (json)", sse.openai_deltas, chunks, rounds)
+    sse.loads = fast_loads
+
+    # Same tokens regardless of how the bytes were split
+    for size in (1, 7, 64):
+        body = b"".join(chunks)
+        split = [body[i:i + size] for i in range(0, len(body), size)]
+        assert await consume(sse.openai_deltas(make_response(split))) == count
+    print(f"  speedup {rate / legacy_rate:.1f}x, token counts {'match' if count == legacy_count else 'DIFFER'}")
+    return count == legacy_count
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    sys.exit(0 if asyncio.run(main(total, repeats)) else 1)
@@ -0,0 +1,59 @@
+# Cold-start cost of the server entry points: wall time of a fresh interpreter importing
+# server.py (which serves app.py's blueprint) and app.py on its own, the slowest imports under
+# each from python -X importtime, and which heavy optional libraries got loaded along the way.
+# Each module is imported RUNS times in a new process; the median is reported.
+# Run from the repo root: python -m benchmarks.bench_startup [runs]
+import os
+import sys
+import statistics
+import subprocess
+
+ENTRY_POINTS = ("server", "app")
+# None of these are needed to serve /ws/live or the REST API
+HEAVY = ("sounddevice", "pyaudio", "numpy", "deepgram", "aiohttp", "requests")
+TOP_IMPORTS = 8
+
+PROBE = ("import sys, time; t = time.perf_counter(); import {module}; elapsed = time.perf_counter() - t; "
+         "print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))")
+
+
+def import_once(module: str) -> tuple[float, list[str]]:
+    result = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                            capture_output=True, text=True, check=True, env=os.environ)
+    elapsed, _, loaded = result.stdout.strip().partition(" ")
+    return float(elapsed), [name for name in loaded.split(",") if name]
+
+
+def slowest_imports(module: str) -> list[tuple[int, str]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True, env=os.environ)
+    top = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Direct children of the entry point are indented by exactly three spaces
+        if name.startswith("   ") and not name.startswith("    "):
+            top.append((int(cumulative), name.strip()))
+    return sorted(top, reverse=True)[:TOP_IMPORTS]
+
+
+def main(runs: int):
+    ok = True
+    for module in ENTRY_POINTS:
+        times, loaded = [], []
+        for _ in range(runs):
+            elapsed, loaded = import_once(module)
+            times.append(elapsed)
+        print(f"import {module}: median {statistics.median(times) * 1000:.0f}ms, "
+              f"min {min(times) * 1000:.0f}ms over {runs} runs")
+        print(f"  heavy libraries loaded: {', '.join(loaded) or 'none'}")
+        for cumulative, name in slowest_imports(module):
+            print(f"  {cumulative / 1000:7.1f}ms  {name}")
+        ok = ok and not loaded
+    return ok
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sys.exit(0 if main(count) else 1)
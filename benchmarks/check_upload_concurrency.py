@@ -0,0 +1,64 @@
+# Fires many simultaneous /api/audio uploads and checks every transcript belongs to its own input.
+# Upstreams are replaced in-process, so only the upload path is exercised.
+# Run from the repo root: python -m benchmarks.check_upload_concurrency [uploads]
+import os
+import sys
+import time
+import random
+import asyncio
+import hashlib
+
+from io import BytesIO
+
+os.environ.setdefault("DEEPGRAM_API_KEY", "0" * 40)
+
+from quart.datastructures import FileStorage
+
+import app as api_module
+from server import app
+
+
+async def fake_transcribe(audio: bytes, mimetype: str = "audio/wav"):
+    # Finish in random order so any shared buffer between requests would show up as a mismatch
+    await asyncio.sleep(random.uniform(0, 0.05))
+    return hashlib.sha256(audio).hexdigest(), 0.0
+
+
+async def fake_llm(prompt: str):
+    return f"echo {prompt}", 0.0
+
+
+async def fake_tts(text: str, **kwargs):
+    yield b"audio"
+
+
+async def upload(client, index: int) -> bool:
+    audio = os.urandom(2048) + index.to_bytes(4, "big")
+    response = await client.post(
+        "/api/audio",
+        form={"llm": "openai", "format": "json", "cache": "false"},
+        files={"audio": FileStorage(BytesIO(audio), filename=f"{index}.wav", content_type="audio/wav")},
+    )
+    data = await response.get_json()
+    return data.get("transcript") == hashlib.sha256(audio).hexdigest()
+
+
+async def main(uploads: int):
+    api_module.transcribe_audio = fake_transcribe
+    api_module.get_llm_function = lambda name: fake_llm
+    api_module.stream_tts = fake_tts
+
+    client = app.test_client()
+    start = time.perf_counter()
+    results = await asyncio.gather(*[upload(client, i) for i in range(uploads)])
+    elapsed = time.perf_counter() - start
+
+    mismatches = results.count(False)
+    print(f"{uploads} concurrent uploads in {elapsed:.2f}s: {uploads - mismatches} matched, {mismatches} mismatched")
+    print(f"temp.wav written: {os.path.exists('temp.wav') and os.path.getmtime('temp.wav') >= time.time() - elapsed - 1}")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    sys.exit(0 if asyncio.run(main(count)) else 1)
@@ -0,0 +1,203 @@
+# Opens N simultaneous /ws/live sessions, replays a recorded utterance in real time on each, and
+# reports time-to-first-audio percentiles plus the server's CPU use and event-loop lag.
+# Start the mocks (python -m benchmarks.mock_upstreams) and server.py pointed at them first.
+# Run from the repo root: python -m benchmarks.load_ws_live [--sessions 50] [--turns 3] [--fixture temp.wav]
+import re
+import sys
+import json
+import time
+import wave
+import asyncio
+import argparse
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import websockets
+
+import metrics
+from audio_frames import FRAME_HEADER, FLAG_FINAL
+
+# MediaRecorder in test2.html emits a chunk every 200 ms; PCM goes out in 20 ms frames
+CONTAINER_CHUNK_SECONDS = 0.2
+PCM_FRAME_SECONDS = 0.02
+
+
+# === Fixtures ===
+# Returns (chunks, seconds per chunk, extra query string). RIFF WAV files are sent as raw
+# linear16 so the server-side VAD runs; anything else (temp.wav is really WebM/Opus) is split
+# into evenly sized chunks over speech_seconds, as a browser would send it.
+def load_fixture(path: str, speech_seconds: float):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == b"RIFF":
+        with wave.open(path) as wav:
+            rate, width = wav.getframerate(), wav.getsampwidth()
+            if width != 2 or wav.getnchannels() != 1:
+                sys.exit(f"{path}: only mono 16-bit WAV can be sent as linear16")
+            pcm = wav.readframes(wav.getnframes())
+        step = int(rate * PCM_FRAME_SECONDS) * 2
+        return [pcm[i:i + step] for i in range(0, len(pcm), step)], PCM_FRAME_SECONDS, f"encoding=linear16&sample_rate={rate}"
+
+    count = max(int(speech_seconds / CONTAINER_CHUNK_SECONDS), 1)
+    step = -(-len(data) // count)
+    return [data[i:i + step] for i in range(0, len(data), step)], CONTAINER_CHUNK_SECONDS, ""
+
+
+# === One Session ===
+# Audio frames carry (turn id, sequence, flags); frames from an older turn are stale and
+# ignored, and the frame flagged final ends the turn.
+async def run_session(args, chunks, chunk_seconds, query, ttfa: list, first_ttfa: list, failures: list, received: list):
+    loop = asyncio.get_running_loop()
+    query = "&".join(filter(None, [query, f"format={args.format}"]))
+    url = f"{args.url}{'&' if '?' in args.url else '?'}{query}"
+    first_audio = asyncio.Event()
+    turn_done = asyncio.Event()
+    first_at = [0.0]
+    current = {"turn": None, "seq": 0}
+
+    async def read(ws):
+        async for message in ws:
+            if isinstance(message, str):
+                event = json.loads(message)
+                if event["type"] == "flush":
+                    current.update(turn=event["turn"], seq=0)
+                continue
+            turn, seq, flags = FRAME_HEADER.unpack_from(message)
+            if turn != current["turn"]:
+                continue
+            if seq != current["seq"]:
+                raise RuntimeError(f"turn {turn}: frame {seq} arrived, expected {current['seq']}")
+            current["seq"] += 1
+            received.append(len(message))
+            if not first_audio.is_set():
+                first_at[0] = loop.time()
+                first_audio.set()
+            if flags & FLAG_FINAL:
+                turn_done.set()
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            reader = asyncio.create_task(read(ws))
+            try:
+                for turn in range(args.turns):
+                    first_audio.clear()
+                    turn_done.clear()
+                    start = loop.time()
+                    for i, chunk in enumerate(chunks):
+                        await asyncio.sleep(max(start + i * chunk_seconds - loop.time(), 0))
+                        await ws.send(chunk)
+                    speech_end = loop.time()
+
+                    await asyncio.wait_for(first_audio.wait(), timeout=args.timeout)
+                    ttfa.append(first_at[0] - speech_end)
+                    if turn == 0:
+                        first_ttfa.append(first_at[0] - speech_end)
+                    await asyncio.wait_for(turn_done.wait(), timeout=args.timeout)
+                    if reader.done():
+                        reader.result()
+            finally:
+                reader.cancel()
+    except Exception as e:
+        failures.append(type(e).__name__)
+
+
+# === Server-side Numbers (scraped from /metrics) ===
+def metrics_url(ws_url: str) -> str:
+    scheme, netloc, *_ = urlsplit(ws_url)
+    return urlunsplit(("https" if scheme == "wss" else "http", netloc, "/metrics", "", ""))
+
+
+async def scrape(url: str) -> dict:
+    try:
+        async with httpx.AsyncClient() as client:
+            text = (await client.get(url, timeout=5.0)).text
+    except httpx.HTTPError:
+        return {}
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def lag_quantile(before: dict, after: dict, q: float) -> str:
+    pattern = re.compile(r'voice_event_loop_lag_seconds_bucket\{le="([^"]+)"\}')
+    buckets = sorted(((float(m.group(1)), after[name] - before.get(name, 0))
+                      for name in after if (m := pattern.fullmatch(name))))
+    total = buckets[-1][1] if buckets else 0
+    for bound, cumulative in buckets:
+        if total and cumulative >= q * total:
+            return f"<={bound * 1000:g}ms"
+    return "n/a"
+
+
+async def main(args):
+    chunks, chunk_seconds, query = load_fixture(args.fixture, args.speech_seconds)
+    ttfa, first_ttfa, failures, received = [], [], [], []
+    scrape_url = metrics_url(args.url)
+
+    before = await scrape(scrape_url)
+    start = time.perf_counter()
+    sessions = []
+    for _ in range(args.sessions):
+        sessions.append(asyncio.create_task(run_session(args, chunks, chunk_seconds, query, ttfa, first_ttfa, failures, received)))
+        # Spread connection setup so sessions do not all speak in lockstep
+        await asyncio.sleep(args.ramp_seconds / args.sessions)
+    await asyncio.gather(*sessions)
+    wall = time.perf_counter() - start
+    after = await scrape(scrape_url)
+
+    print(f"{args.sessions} sessions x {args.turns} turns in {wall:.1f}s: {len(ttfa)} turns answered, {len(failures)} sessions failed")
+    if failures:
+        print(f"  failures: {', '.join(sorted(set(failures)))}")
+    print(f"  audio ({args.format}): {sum(received) / max(len(ttfa), 1) / 1024:.1f} KiB per turn in "
+          f"{len(received) / max(len(ttfa), 1):.0f} frames")
+    print(f"  time to first audio: p50={metrics.quantile(ttfa, 0.5) * 1000:.0f}ms "
+          f"p95={metrics.quantile(ttfa, 0.95) * 1000:.0f}ms p99={metrics.quantile(ttfa, 0.99) * 1000:.0f}ms")
+    print(f"  first turn only:     p50={metrics.quantile(first_ttfa, 0.5) * 1000:.0f}ms "
+          f"p95={metrics.quantile(first_ttfa, 0.95) * 1000:.0f}ms")
+
+    if not after:
+        print(f"  {scrape_url} unreachable; no server CPU or event-loop numbers")
+        return not failures
+    cpu = after["voice_process_cpu_seconds"] - before.get("voice_process_cpu_seconds", 0)
+    cores = cpu / wall
+    print(f"  server CPU: {cpu:.1f}s over {wall:.1f}s = {cores:.2f} cores busy, "
+          f"{args.sessions / cores if cores else float('inf'):.0f} sessions per core")
+    delta = lambda name: after.get(f"voice_{name}", 0) - before.get(f"voice_{name}", 0)
+    print(f"  upstream HTTP connections opened: {delta('upstream_connections_opened'):.0f}")
+    if (started := delta("llm_speculation_started_total")):
+        saved = delta("llm_speculation_saved_seconds_sum") / max(delta("llm_speculation_saved_seconds_count"), 1)
+        print(f"  speculation: {started:.0f} started, {delta('llm_speculation_committed_total'):.0f} committed, "
+              f"{delta('llm_speculation_discarded_total'):.0f} discarded "
+              f"({delta('llm_speculation_wasted_tokens_total'):.0f} tokens wasted), "
+              f"{saved * 1000:.0f}ms saved per committed turn")
+    # Summed across labels (providers)
+    family = lambda name: sum(v for k, v in after.items() if k.split("{")[0] == f"voice_{name}") - \
+        sum(v for k, v in before.items() if k.split("{")[0] == f"voice_{name}")
+    if (turns := family("turn_queue_wait_seconds_count")):
+        providers = ("openai", "gemini", "elevenlabs")
+        throttled = sum(family(f"upstream_{p}_throttled_total") for p in providers)
+        retries = sum(family(f"upstream_{p}_retries_total") for p in providers)
+        print(f"  admission: {family('turn_queue_wait_seconds_sum') / turns * 1000:.0f}ms queued per turn, "
+              f"{throttled:.0f} throttled answers, {retries:.0f} retries")
+    lag_count = after.get("voice_event_loop_lag_seconds_count", 0) - before.get("voice_event_loop_lag_seconds_count", 0)
+    lag_sum = after.get("voice_event_loop_lag_seconds_sum", 0) - before.get("voice_event_loop_lag_seconds_sum", 0)
+    if lag_count:
+        print(f"  event-loop lag: mean={lag_sum / lag_count * 1000:.1f}ms p50{lag_quantile(before, after, 0.5)} "
+              f"p99{lag_quantile(before, after, 0.99)}")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /ws/live load generator")
+    parser.add_argument("--url", default="ws://127.0.0.1:5000/ws/live", help="add ?llm=gemini etc. to pick the provider")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--fixture", default="temp.wav")
+    parser.add_argument("--speech-seconds", type=float, default=3.0, help="replay length for non-WAV fixtures")
+    parser.add_argument("--ramp-seconds", type=float, default=2.0)
+    parser.add_argument("--format", default="mp3", choices=["mp3", "pcm", "opus"], help="negotiated output format")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
@@ -0,0 +1,258 @@
+# Local stand-ins for Azure OpenAI, ElevenLabs, Deepgram (live and prerecorded) and Gemini, so server.py can be
+# load-tested without spending real money. One process serves all four protocols.
+# Run from the repo root: python -m benchmarks.mock_upstreams [--port 8100] [options]
+# then start server.py with the environment this prints.
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from quart import Quart, Response, request, websocket, abort
+
+app = Quart(__name__)
+config = argparse.Namespace()
+
+WORDS = ("the ocean covers most of our planet and holds nearly all of its water while deep "
+         "currents move heat from the tropics toward the poles over many slow centuries").split()
+TRANSCRIPTS = [
+    "Tell me something interesting about the ocean.",
+    "How far away is the moon?",
+    "What should I cook for dinner tonight?",
+    "Can you explain how tides work?",
+]
+# Bytes per second of audio for the ElevenLabs output formats the app asks for
+AUDIO_BYTE_RATES = {"mp3_44100": 16000, "mp3_44100_128": 16000, "pcm_16000": 32000,
+                    "pcm_22050": 44100, "pcm_24000": 48000, "opus_48000_64": 8000}
+SPEECH_CHARS_PER_SECOND = 15
+
+
+def should_fail(rate: float) -> bool:
+    return random.random() < rate
+
+
+def error_response(service: str):
+    headers = {"Retry-After": "1"} if config.error_status == 429 else {}
+    return Response(json.dumps({"error": f"mock {service} failure"}), status=config.error_status,
+                    mimetype="application/json", headers=headers)
+
+
+def generate_tokens(count: int) -> list[str]:
+    tokens, words = [], 0
+    for i in range(count):
+        word = random.choice(WORDS)
+        tokens.append((" " if tokens else "") + (word.capitalize() if words == 0 else word))
+        words += 1
+        # End a sentence every 6-14 words so the segmenter has something to cut on
+        if words >= random.randint(6, 14) or i == count - 1:
+            tokens[-1] += "."
+            words = 0
+    return tokens
+
+
+async def sleep_ms(ms: float):
+    if ms > 0:
+        await asyncio.sleep(ms / 1000)
+
+
+# === Azure OpenAI chat completions (JSON and SSE) ===
+@app.route("/openai/deployments/<deployment>/chat/completions", methods=["POST"])
+async def azure_chat(deployment):
+    body = await request.get_json()
+    if should_fail(config.llm_error_rate):
+        return error_response("azure")
+    tokens = generate_tokens(min(body.get("max_tokens", config.llm_tokens), config.llm_tokens))
+    interval = 1 / config.llm_tokens_per_second
+
+    if not body.get("stream"):
+        await sleep_ms(config.llm_first_token_ms)
+        await asyncio.sleep(interval * len(tokens))
+        return {"choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}]}
+
+    def event(choices):
+        return f"data: {json.dumps({'object': 'chat.completion.chunk', 'model': deployment, 'choices': choices})}\n\n"
+
+    async def events():
+        # Azure opens with a content-filter chunk that carries no choices
+        yield "data: " + json.dumps({"choices": [], "prompt_filter_results": []}) + "\n\n"
+        await sleep_ms(config.llm_first_token_ms)
+        yield event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for token in tokens:
+            yield event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+            await asyncio.sleep(interval)
+        yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        yield "data: [DONE]\n\n"
+
+    return Response(events(), mimetype="text/event-stream")
+
+
+# === Gemini generateContent / streamGenerateContent ===
+@app.route("/v1beta/models/<model>:generateContent", methods=["POST"])
+async def gemini_generate(model):
+    if should_fail(config.llm_error_rate):
+        return error_response("gemini")
+    tokens = generate_tokens(config.llm_tokens)
+    await sleep_ms(config.llm_first_token_ms)
+    await asyncio.sleep(len(tokens) / config.llm_tokens_per_second)
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": "".join(tokens)}]},
+                            "finishReason": "STOP"}]}
+
+
+@app.route("/v1beta/models/<model>:streamGenerateContent", methods=["POST"])
+async def gemini_stream(model):
+    if should_fail(config.llm_error_rate):
+        return error_response("gemini")
+    tokens = generate_tokens(config.llm_tokens)
+
+    async def events():
+        await sleep_ms(config.llm_first_token_ms)
+        for i, token in enumerate(tokens):
+            candidate = {"content": {"role": "model", "parts": [{"text": token}]}, "index": 0}
+            if i == len(tokens) - 1:
+                candidate["finishReason"] = "STOP"
+            yield f"data: {json.dumps({'candidates': [candidate]})}\r\n\r\n"
+            await asyncio.sleep(1 / config.llm_tokens_per_second)
+
+    return Response(events(), mimetype="text/event-stream")
+
+
+# === ElevenLabs streaming TTS ===
+@app.route("/v1/text-to-speech/<voice_id>/stream", methods=["POST"])
+async def elevenlabs_stream(voice_id):
+    body = await request.get_json()
+    if should_fail(config.tts_error_rate):
+        return error_response("elevenlabs")
+    output_format = request.args.get("output_format", "mp3_44100")
+    byte_rate = AUDIO_BYTE_RATES.get(output_format, 16000)
+    total = int(len(body.get("text", "")) / SPEECH_CHARS_PER_SECOND * byte_rate)
+    total -= total % 2
+    chunk = bytes(4096)
+    # Audio is produced tts_realtime_factor times faster than it plays
+    chunk_seconds = len(chunk) / byte_rate / config.tts_realtime_factor
+
+    async def audio():
+        await sleep_ms(config.tts_first_byte_ms)
+        sent = 0
+        while sent < total:
+            piece = chunk[:total - sent]
+            yield piece
+            sent += len(piece)
+            await asyncio.sleep(chunk_seconds)
+
+    mimetype = {"mp3": "audio/mpeg", "opu": "audio/ogg"}.get(output_format[:3], "application/octet-stream")
+    return Response(audio(), mimetype=mimetype)
+
+
+# === Deepgram prerecorded transcription (/api/audio) ===
+# Recognition takes stt_delay_ms plus a little per second of audio, assuming ~32 KB/s
+@app.route("/v1/listen", methods=["POST"])
+async def deepgram_prerecorded():
+    if should_fail(config.stt_error_rate):
+        return error_response("deepgram")
+    audio = await request.get_data()
+    await sleep_ms(config.stt_delay_ms + len(audio) / 32000 * 50)
+    return {
+        "metadata": {"duration": round(len(audio) / 32000, 3), "channels": 1},
+        "results": {"channels": [{"alternatives": [{"transcript": random.choice(TRANSCRIPTS), "confidence": 0.98}]}]},
+    }
+
+
+# === Deepgram live transcription ===
+# Any audio counts as speech; a gap longer than the requested endpointing closes the utterance
+# with an is_final + speech_final result, after stt_delay_ms of simulated recognition time.
+# stt_connect_ms stands in for the WebSocket + TLS handshake to the real service. Interim
+# results come every stt_interim_ms of audio: the first word, then the whole phrase, except
+# that with stt_interim_mismatch_rate the interims stop one word short of the final.
+@app.websocket("/v1/listen")
+async def deepgram_listen():
+    if should_fail(config.stt_error_rate):
+        abort(503)
+    await sleep_ms(config.stt_connect_ms)
+    await websocket.accept()
+    endpointing = int(websocket.args.get("endpointing", 300)) / 1000
+    interim_results = websocket.args.get("interim_results") == "true"
+    transcript = random.choice(TRANSCRIPTS)
+    received = 0
+    interims = 0
+    last_interim = 0.0
+    started_at = time.monotonic()
+
+    def interim_text() -> str:
+        words = transcript.split()
+        if interims == 0:
+            return words[0]
+        return " ".join(words[:-1]) if mismatch else transcript
+
+    def result(is_final: bool, text: str) -> str:
+        return json.dumps({
+            "type": "Results", "is_final": is_final, "speech_final": is_final,
+            "start": 0.0, "duration": round(time.monotonic() - started_at, 3),
+            "channel": {"alternatives": [{"transcript": text, "confidence": 0.98}]},
+        })
+
+    while True:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), timeout=endpointing if received else None)
+        except asyncio.TimeoutError:
+            await sleep_ms(config.stt_delay_ms)
+            await websocket.send(result(True, transcript))
+            received = interims = 0
+            transcript = random.choice(TRANSCRIPTS)
+            continue
+
+        if isinstance(message, bytes):
+            if not received:
+                mismatch = random.random() < config.stt_interim_mismatch_rate
+            now = time.monotonic()
+            if interim_results and (not received or now - last_interim >= config.stt_interim_ms / 1000):
+                await websocket.send(result(False, interim_text()))
+                interims += 1
+                last_interim = now
+            received += len(message)
+        elif json.loads(message).get("type") == "CloseStream":
+            if received:
+                await websocket.send(result(True, transcript))
+            return
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Azure OpenAI / ElevenLabs / Deepgram / Gemini upstreams")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--llm-first-token-ms", type=float, default=300)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=40)
+    parser.add_argument("--llm-tokens", type=int, default=60)
+    parser.add_argument("--tts-first-byte-ms", type=float, default=250)
+    parser.add_argument("--tts-realtime-factor", type=float, default=4.0)
+    parser.add_argument("--stt-delay-ms", type=float, default=100)
+    parser.add_argument("--stt-connect-ms", type=float, default=0, help="Deepgram handshake time")
+    parser.add_argument("--stt-interim-ms", type=float, default=300)
+    parser.add_argument("--stt-interim-mismatch-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="default for every service")
+    parser.add_argument("--llm-error-rate", type=float)
+    parser.add_argument("--tts-error-rate", type=float)
+    parser.add_argument("--stt-error-rate", type=float)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args(argv)
+    for service in ("llm", "tts", "stt"):
+        if getattr(args, f"{service}_error_rate") is None:
+            setattr(args, f"{service}_error_rate", args.error_rate)
+    return args
+
+
+def configure(argv=None):
+    vars(config).update(vars(parse_args(argv)))
+    return config
+
+
+if __name__ == "__main__":
+    import uvicorn
+    configure()
+    base = f"http://{config.host}:{config.port}"
+    print("Point server.py at the mocks with:")
+    print(f"  export AZURE_OPENAI_ENDPOINT={base}/ ELEVENLABS_BASE_URL={base} GEMINI_BASE_URL={base} "
+          f"DEEPGRAM_LISTEN_URL=ws://{config.host}:{config.port}/v1/listen DEEPGRAM_API_URL={base}/v1 "
+          "TTS_CACHE_ENABLED=false")
+    print("  export AZURE_OPENAI_API_KEY=mock ELEVENLABS_API_KEY=mock GEMINI_API_KEY=mock DEEPGRAM_API_KEY=" + "0" * 40)
+    uvicorn.run(app, host=config.host, port=config.port, log_level="warning")
@@ -0,0 +1,97 @@
+import os
+import asyncio
+
+import metrics
+
+# === Capture Config ===
+MIC_SAMPLE_RATE = 16000
+MIC_BLOCK_SAMPLES = int(os.getenv("MIC_BLOCK_SAMPLES", "1024"))
+# Audio the ring holds before new blocks are dropped (the sender fell behind)
+MIC_RING_SECONDS = float(os.getenv("MIC_RING_SECONDS", "2"))
+# The sender forwards audio once this much is buffered (default: one device block), and
+# catches up after a stall in sends of at most MIC_BATCH_MAX_MS
+MIC_BATCH_MS = int(os.getenv("MIC_BATCH_MS", "64"))
+MIC_BATCH_MAX_MS = int(os.getenv("MIC_BATCH_MAX_MS", "250"))
+
+
+# === Single-producer / single-consumer Ring ===
+# The audio thread only ever advances the write position and the event loop only the read
+# position, so neither side takes a lock; under the GIL each int store is atomic. A block
+# that does not fit is dropped whole and counted as an overrun rather than overwriting audio
+# the sender has not read yet. The consumer is only woken through call_soon_threadsafe when
+# it is actually waiting, instead of once per block.
+class CaptureRing:
+    def __init__(self, loop: asyncio.AbstractEventLoop, sample_rate: int = MIC_SAMPLE_RATE,
+                 seconds: float = MIC_RING_SECONDS, batch_ms: int = MIC_BATCH_MS,
+                 batch_max_ms: int = MIC_BATCH_MAX_MS):
+        self.loop = loop
+        self.capacity = int(sample_rate * seconds) * 2
+        self.batch_bytes = max(sample_rate * batch_ms // 1000 * 2, 2)
+        self.batch_max_bytes = max(sample_rate * batch_max_ms // 1000 * 2, self.batch_bytes)
+        self._ring = bytearray(self.capacity)
+        self._view = memoryview(self._ring)
+        self._written = 0
+        self._read = 0
+        self._waiting = False
+        self._wake = asyncio.Event()
+        self.closed = False
+        self.stats = {"blocks": 0, "overruns": 0, "bytes_dropped": 0, "device_overflows": 0,
+                      "batches": 0, "max_fill_bytes": 0}
+
+    # === Audio thread ===
+    def write(self, block, status=None):
+        if status and status.input_overflow:
+            self.stats["device_overflows"] += 1
+            metrics.incr("mic_device_overflows")
+        data = memoryview(block).cast("B")
+        size = len(data)
+        self.stats["blocks"] += 1
+        fill = self._written - self._read
+        if fill + size > self.capacity:
+            self.stats["overruns"] += 1
+            self.stats["bytes_dropped"] += size
+            metrics.incr("mic_overruns")
+        else:
+            start = self._written % self.capacity
+            first = min(size, self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            self._view[:size - first] = data[first:]
+            self._written += size
+            self.stats["max_fill_bytes"] = max(self.stats["max_fill_bytes"], fill + size)
+        if self._waiting and self._written - self._read >= self.batch_bytes:
+            self._waiting = False
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    # === Event loop ===
+    def close(self):
+        self.closed = True
+        self._wake.set()
+
+    def _take(self, size: int) -> bytes:
+        start = self._read % self.capacity
+        if start + size <= self.capacity:
+            batch = bytes(self._view[start:start + size])
+        else:
+            batch = b"".join((self._view[start:], self._view[:start + size - self.capacity]))
+        # Only now may the audio thread reuse this space
+        self._read += size
+        return batch
+
+    # The next batch in capture order; after close() the remainder, then None
+    async def get(self):
+        while self._written - self._read < self.batch_bytes and not self.closed:
+            self._wake.clear()
+            self._waiting = True
+            # Re-check after announcing the wait, or a block written in between goes unnoticed
+            if self._written - self._read >= self.batch_bytes:
+                self._waiting = False
+                break
+            await self._wake.wait()
+        available = self._written - self._read
+        if not available:
+            return None
+        self.stats["batches"] += 1
+        return self._take(min(available, self.batch_max_bytes))
+
+    def summary(self) -> dict:
+        return {"buffered_bytes": self._written - self._read, **self.stats}
@@ -0,0 +1,65 @@
+import os
+import logging
+
+from dotenv import load_dotenv
+
+# === Environment ===
+# Imported first by every entry point, so .env is loaded once and before any module reads
+# its tuning knobs from os.environ
+load_dotenv()
+
+
+def _env(*names: str, default: str | None = None) -> str | None:
+    for name in names:
+        if (value := os.getenv(name)):
+            return value
+    return default
+
+
+# === Provider Settings ===
+# The one place provider credentials and endpoints are read. Older names are still accepted
+# after the canonical one: AZURE_OPENAI_CHAT_DEPLOYMENT_NAME and OPENAI_API_VERSION.
+AZURE_OPENAI_API_KEY: str | None = _env("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_ENDPOINT: str | None = _env("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_DEPLOYMENT: str | None = _env("AZURE_OPENAI_DEPLOYMENT", "AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
+AZURE_OPENAI_API_VERSION: str | None = _env("AZURE_OPENAI_API_VERSION", "OPENAI_API_VERSION")
+# Request URLs are built as f"{AZURE_OPENAI_ENDPOINT}openai/..."
+if AZURE_OPENAI_ENDPOINT and not AZURE_OPENAI_ENDPOINT.endswith("/"):
+    AZURE_OPENAI_ENDPOINT += "/"
+
+GEMINI_API_KEY: str | None = _env("GEMINI_API_KEY")
+GEMINI_BASE_URL: str = _env("GEMINI_BASE_URL", default="https://generativelanguage.googleapis.com")
+
+ELEVENLABS_API_KEY: str | None = _env("ELEVENLABS_API_KEY")
+ELEVENLABS_BASE_URL: str = _env("ELEVENLABS_BASE_URL", default="https://api.elevenlabs.io")
+
+DEEPGRAM_API_KEY: str | None = _env("DEEPGRAM_API_KEY")
+# Point at a local stand-in (benchmarks/mock_upstreams.py) for load tests
+DEEPGRAM_LISTEN_URL: str = _env("DEEPGRAM_LISTEN_URL", default="wss://api.deepgram.com/v1/listen")
+# Prerecorded transcription (/api/audio); the SDK appends /listen
+DEEPGRAM_API_URL: str = _env("DEEPGRAM_API_URL", default="https://api.deepgram.com/v1")
+
+# Settings a provider cannot be used without
+REQUIRED = {
+    "openai": ("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_DEPLOYMENT", "AZURE_OPENAI_API_VERSION"),
+    "gemini": ("GEMINI_API_KEY",),
+    "elevenlabs": ("ELEVENLABS_API_KEY",),
+    "deepgram": ("DEEPGRAM_API_KEY",),
+}
+
+
+# === Validation ===
+def missing(*providers: str) -> list[str]:
+    return [name for provider in providers for name in REQUIRED[provider] if not globals()[name]]
+
+
+# Servers warn and keep running (a provider may simply be unused); the local CLIs refuse to start
+def check(*providers: str) -> bool:
+    for name in missing(*providers):
+        logging.warning(f"[CONFIG] {name} is not set")
+    return not missing(*providers)
+
+
+def require(*providers: str):
+    if (names := missing(*providers)):
+        raise ValueError(f"Missing settings: {', '.join(names)}")
@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from collections import deque
+
+import metrics
+from llm import ask_gpt, GPT_FAILED
+from llm_gemini import ask_gemini, GEMINI_FAILED
+
+# === Conversation Memory Config ===
+# Token counts are estimated (~4 characters per token); the budget covers the system prompt,
+# rolling summary, recent turns and the new utterance sent with each request.
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1500"))
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200"))
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    # Every message also carries a few tokens of role/formatting overhead
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + 4
+
+
+# === Rolling Summary ===
+# Folds turns that fell out of the window into the running summary; None keeps the old one.
+# Uses the session's own provider ("hedged" sessions summarize with their Azure primary).
+async def summarize_turns(summary: str, turns: list[tuple[str, str]], provider: str = "openai") -> str | None:
+    exchanges = "\n".join(f"User: {user}\nAssistant: {assistant}" for user, assistant in turns)
+    prompt = (
+        f"Update the running summary of a voice conversation in under {CONVERSATION_SUMMARY_TOKENS // 2} words. "
+        "Keep names, facts, preferences and open questions; drop small talk.\n\n"
+        f"Summary so far: {summary or '(none)'}\n\nNew exchanges:\n{exchanges}"
+    )
+    ask, failed = (ask_gemini, GEMINI_FAILED) if provider == "gemini" else (ask_gpt, GPT_FAILED)
+    response, _ = await ask(prompt)
+    return None if response == failed else response.strip()
+
+
+# === Per-session Conversation State ===
+# Recent turns live in a bounded ring buffer with a running token total. Turns pushed out by
+# the turn limit or the token budget are summarized by a background task, so building the
+# next request never waits on the LLM and prompt size stays flat as the call goes on.
+class Conversation:
+    def __init__(self, system_prompt: str = None, provider: str = "openai", token_budget: int = CONVERSATION_TOKEN_BUDGET,
+                 max_turns: int = CONVERSATION_MAX_TURNS, summarize=summarize_turns):
+        self.system_prompt = system_prompt
+        self.provider = provider
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary = ""
+        self._turns = deque(maxlen=max_turns)  # (user, assistant, tokens)
+        self._tokens = 0
+        self._evicted = []
+        self._summarizer = None
+
+    def _fixed_tokens(self) -> int:
+        tokens = estimate_tokens(self.system_prompt) if self.system_prompt else 0
+        return tokens + (estimate_tokens(self.summary) if self.summary else 0)
+
+    def messages(self, prompt: str) -> list[dict]:
+        budget = self.token_budget - self._fixed_tokens() - estimate_tokens(prompt)
+        recent = []
+        for user, assistant, tokens in reversed(self._turns):
+            if tokens > budget:
+                break
+            budget -= tokens
+            recent.append((user, assistant))
+
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        for user, assistant in reversed(recent):
+            messages.append({"role": "user", "content": user})
+            if assistant:
+                messages.append({"role": "assistant", "content": assistant})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def add_turn(self, user: str, assistant: str):
+        if len(self._turns) == self._turns.maxlen:
+            self._evict()
+        tokens = estimate_tokens(user) + (estimate_tokens(assistant) if assistant else 0)
+        self._turns.append((user, assistant, tokens))
+        self._tokens += tokens
+        # Always keep the latest turn, even if it alone exceeds the budget
+        while len(self._turns) > 1 and self._tokens + self._fixed_tokens() > self.token_budget:
+            self._evict()
+        if self._evicted and (self._summarizer is None or self._summarizer.done()):
+            self._summarizer = asyncio.create_task(self._summarize_evicted())
+
+    def _evict(self):
+        user, assistant, tokens = self._turns.popleft()
+        self._tokens -= tokens
+        self._evicted.append((user, assistant))
+
+    async def _summarize_evicted(self):
+        while self._evicted:
+            turns, self._evicted = self._evicted, []
+            try:
+                summary = await self.summarize(self.summary, turns, self.provider)
+            except Exception:
+                logging.exception("[CONVERSATION] Summary failed")
+                summary = None
+            if summary:
+                self.summary = summary[:CONVERSATION_SUMMARY_TOKENS * CHARS_PER_TOKEN]
+            metrics.incr("conversation_summaries")
+            metrics.incr("conversation_turns_summarized", len(turns))
+            logging.info(f"[CONVERSATION] Folded {len(turns)} turns into summary ({estimate_tokens(self.summary)} tokens)")
+
+    async def close(self):
+        if self._summarizer and not self._summarizer.done():
+            self._summarizer.cancel()
+            await asyncio.gather(self._summarizer, return_exceptions=True)
@@ -0,0 +1,125 @@
+import os
+import time
+import json
+import asyncio
+import logging
+from collections import deque
+
+import websockets
+
+import metrics
+from config import DEEPGRAM_API_KEY, DEEPGRAM_LISTEN_URL
+from turn_detection import DEEPGRAM_KEEPALIVE_SECONDS, deepgram_listen_params
+
+# === Standby Pool Config ===
+# Ready Deepgram sockets per listen configuration (encoding / sample rate), handed to new
+# sessions so they skip the WebSocket + TLS handshake. 0 disables the pool.
+DEEPGRAM_STANDBY_POOL_SIZE = int(os.getenv("DEEPGRAM_STANDBY_POOL_SIZE", "0"))
+# Idle standby sockets are replaced after this long rather than kept alive forever
+DEEPGRAM_STANDBY_MAX_AGE = float(os.getenv("DEEPGRAM_STANDBY_MAX_AGE", "300"))
+# Configurations kept warm, comma-separated: "container" (browser WebM/Opus, nothing declared)
+# or "<encoding>:<sample_rate>" for raw PCM clients. Sessions asking for anything else connect
+# directly; a client cannot make the pool hold sockets for a configuration it made up.
+DEEPGRAM_STANDBY_CONFIGS = os.getenv("DEEPGRAM_STANDBY_CONFIGS", "container")
+
+
+async def connect_deepgram(params: str):
+    uri = f"{DEEPGRAM_LISTEN_URL}?{params}"
+    return await websockets.connect(uri, extra_headers={"Authorization": f"Token {DEEPGRAM_API_KEY}"})
+
+
+def standby_params(spec: str) -> str:
+    if spec == "container":
+        return deepgram_listen_params()
+    encoding, _, sample_rate = spec.partition(":")
+    return deepgram_listen_params(encoding, int(sample_rate))
+
+
+# === Warm Standby Pool ===
+# acquire() hands out an idle socket when one is ready and otherwise connects directly.
+# A background task keeps idle sockets alive, retires old or closed ones and tops every
+# configured listen configuration back up to size. The caller owns (and closes) whatever
+# acquire() returns.
+class DeepgramStandbyPool:
+    def __init__(self, size: int = DEEPGRAM_STANDBY_POOL_SIZE, max_age: float = DEEPGRAM_STANDBY_MAX_AGE,
+                 configs: str = DEEPGRAM_STANDBY_CONFIGS):
+        self.size = size
+        self.max_age = max_age
+        self.configs = [standby_params(spec.strip()) for spec in configs.split(",") if spec.strip()]
+        self._idle: dict[str, deque] = {}
+        self._refill = asyncio.Event()
+        self._task = None
+        self._stats = {"hits": 0, "misses": 0, "opened": 0, "retired": 0, "connect_errors": 0}
+
+    def _count(self, name: str):
+        self._stats[name] += 1
+        metrics.incr(f"deepgram_standby_{name}")
+
+    def start(self):
+        if self.size > 0 and self.configs:
+            for params in self.configs:
+                self._idle.setdefault(params, deque())
+            self._task = asyncio.create_task(self._maintain())
+            logging.info(f"[DEEPGRAM] Standby pool of {self.size} for each of {len(self.configs)} configurations")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        sockets = [dg_ws for idle in self._idle.values() for dg_ws, _ in idle]
+        self._idle.clear()
+        await asyncio.gather(*(dg_ws.close() for dg_ws in sockets), return_exceptions=True)
+
+    async def acquire(self, params: str):
+        idle = self._idle.get(params)
+        while idle:
+            dg_ws, opened_at = idle.popleft()
+            if dg_ws.open and time.monotonic() - opened_at < self.max_age:
+                self._count("hits")
+                self._refill.set()
+                return dg_ws
+            self._count("retired")
+            asyncio.create_task(dg_ws.close())
+        self._count("misses")
+        if idle is not None:
+            self._refill.set()
+        return await connect_deepgram(params)
+
+    async def _open(self, params: str):
+        try:
+            dg_ws = await connect_deepgram(params)
+        except Exception as e:
+            self._count("connect_errors")
+            logging.warning(f"[DEEPGRAM] Standby connect failed: {e!r}")
+            return
+        self._count("opened")
+        self._idle[params].append((dg_ws, time.monotonic()))
+
+    async def _maintain(self):
+        keepalive = json.dumps({"type": "KeepAlive"})
+        while True:
+            self._refill.clear()
+            # Sorted without awaiting, so a concurrent acquire() never sees a half-filtered deque
+            now = time.monotonic()
+            opening = []
+            for params, idle in list(self._idle.items()):
+                ready = [(dg_ws, opened_at) for dg_ws, opened_at in idle
+                         if dg_ws.open and now - opened_at < self.max_age]
+                for dg_ws, _ in set(idle) - set(ready):
+                    self._count("retired")
+                    asyncio.create_task(dg_ws.close())
+                idle.clear()
+                idle.extend(ready)
+                opening += [self._open(params) for _ in range(self.size - len(idle))]
+            # A socket that closes under a KeepAlive is retired on the next pass
+            sends = [dg_ws.send(keepalive) for idle in self._idle.values() for dg_ws, _ in idle]
+            await asyncio.gather(*sends, *opening, return_exceptions=True)
+
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=DEEPGRAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": sum(map(len, self._idle.values())), **self._stats}
@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+
+# === Pool Config ===
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_DEFAULT_TIMEOUT = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "60"))
+# An origin used this recently most likely still has an idle pooled connection; skip priming it
+HTTP_PREWARM_INTERVAL = float(os.getenv("HTTP_PREWARM_INTERVAL", "30"))
+HTTP_PREWARM_TIMEOUT = float(os.getenv("HTTP_PREWARM_TIMEOUT", "5"))
+
+# One AsyncClient per upstream origin, so every host gets its own connection limit
+_clients: dict[str, httpx.AsyncClient] = {}
+_clients_loop = None
+_http2 = None
+# origin -> monotonic time of the last request or prewarm
+_last_used: dict[str, float] = {}
+
+_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "tls_handshakes": 0,
+    "prewarms": 0,
+    "prewarms_skipped": 0,
+}
+
+
+def _http2_available() -> bool:
+    global _http2
+    if _http2 is None:
+        _http2 = False
+        if HTTP2_ENABLED:
+            try:
+                import h2  # noqa: F401
+                _http2 = True
+            except ImportError:
+                logging.warning("[POOL] HTTP2_ENABLED is set but the 'h2' package is missing, using HTTP/1.1")
+    return _http2
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+async def _trace(event: str, info: dict):
+    if event == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+    elif event == "connection.start_tls.complete":
+        _stats["tls_handshakes"] += 1
+
+
+# === Async Clients ===
+def get_client(url: str) -> httpx.AsyncClient:
+    global _clients_loop
+    loop = asyncio.get_running_loop()
+    if _clients_loop is not loop:
+        # Connections belong to the loop that opened them; never share them across loops
+        if _clients:
+            logging.warning("[POOL] Event loop changed, dropping pooled connections")
+        _clients.clear()
+        _last_used.clear()
+        _clients_loop = loop
+
+    origin = _origin(url)
+    client = _clients.get(origin)
+    if client is None:
+        client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=HTTP_DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[origin] = client
+        logging.info(f"[POOL] Created pooled client for {origin}")
+    return client
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    _stats["requests"] += 1
+    _last_used[_origin(url)] = time.monotonic()
+    return await get_client(url).post(url, extensions={"trace": _trace}, **kwargs)
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs):
+    _stats["requests"] += 1
+    _last_used[_origin(url)] = time.monotonic()
+    async with get_client(url).stream(method, url, extensions={"trace": _trace}, **kwargs) as response:
+        yield response
+
+
+# === Connection Prewarming ===
+# A HEAD on the origin pays DNS, TCP and TLS setup ahead of the first real request and leaves
+# a keep-alive connection in the pool. Whatever status comes back is fine; failures only log.
+async def prewarm(url: str) -> bool:
+    origin = _origin(url)
+    now = time.monotonic()
+    if now - _last_used.get(origin, float("-inf")) < HTTP_PREWARM_INTERVAL:
+        _stats["prewarms_skipped"] += 1
+        return False
+    _last_used[origin] = now
+    try:
+        await get_client(origin).head(origin, timeout=HTTP_PREWARM_TIMEOUT, extensions={"trace": _trace})
+    except httpx.HTTPError as e:
+        logging.debug(f"[POOL] Prewarm of {origin} failed: {e!r}")
+        return False
+    _stats["prewarms"] += 1
+    return True
+
+
+def pool_stats() -> dict:
+    requests_made = _stats["requests"]
+    connections = _stats["connections_opened"]
+    return {
+        "requests": requests_made,
+        "connections_opened": connections,
+        "tls_handshakes": _stats["tls_handshakes"],
+        "pool_hits": max(requests_made + _stats["prewarms"] - connections, 0),
+        "prewarms": _stats["prewarms"],
+        "prewarms_skipped": _stats["prewarms_skipped"],
+        "hosts": sorted(_clients),
+        "http2": _http2_available(),
+    }
+
+
+# === Lifecycle Hooks ===
+async def startup():
+    logging.info(f"[POOL] Upstream pool ready (http2={_http2_available()}, per-host limit={HTTP_MAX_CONNECTIONS_PER_HOST})")
+
+
+async def shutdown():
+    clients = list(_clients.values())
+    _clients.clear()
+    _last_used.clear()
+    for client in clients:
+        await client.aclose()
+    logging.info(f"[POOL] Upstream pool closed: {pool_stats()}")
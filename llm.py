@@ -1,36 +1,34 @@
-import os
 import time
 import logging
-import httpx
+import admission
 
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+from config import AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION
+
+GPT_SAMPLING = {"temperature": 0.7, "max_tokens": 300}
+GPT_FAILED = "GPT failed."
 
 headers = {
     "api-key": AZURE_OPENAI_API_KEY,
     "Content-Type": "application/json"
 }
 
-async def ask_gpt(prompt: str) -> tuple[str, float]:
+async def ask_gpt(prompt: str, deployment: str = AZURE_OPENAI_DEPLOYMENT) -> tuple[str, float]:
     try:
         start = time.time()
         payload = {
             "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7,
-            "max_tokens": 300
+            **GPT_SAMPLING
         }
 
-        url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+        url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{deployment}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()["choices"][0]["message"]["content"]
-            elapsed = time.time() - start
-            logging.info(f"[GPT] GPT took {elapsed:.2f}s: {result}")
-            return result, elapsed
+        cost = admission.chat_cost(payload["messages"], GPT_SAMPLING["max_tokens"])
+        response = await admission.post("openai", url, cost=cost, headers=headers, json=payload, timeout=15.0)
+        response.raise_for_status()
+        result = response.json()["choices"][0]["message"]["content"]
+        elapsed = time.time() - start
+        logging.info(f"[GPT] GPT took {elapsed:.2f}s: {result}")
+        return result, elapsed
     except Exception:
         logging.exception("[GPT] GPT API error")
-        return "GPT failed.", 0.0
+        return GPT_FAILED, 0.0
@@ -0,0 +1,113 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+import metrics
+from llm import GPT_FAILED
+from llm_gemini import GEMINI_FAILED
+
+# === Cache Config ===
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "60"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Fallback strings returned on upstream errors must never be served from cache
+UNCACHEABLE = {GPT_FAILED, GEMINI_FAILED}
+
+_entries = OrderedDict()  # key -> (expires_at, response, size)
+_bytes = 0
+_inflight: dict[str, asyncio.Task] = {}
+
+
+# === Keys ===
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+def cache_key(prompt: str, provider: str, model: str, params: dict) -> str:
+    material = json.dumps([normalize_prompt(prompt), provider, model, params], sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+# === TTL + Size-bounded Store ===
+def lookup(key: str):
+    global _bytes
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    expires_at, response, size = entry
+    if expires_at < time.monotonic():
+        del _entries[key]
+        _bytes -= size
+        return None
+    _entries.move_to_end(key)
+    return response
+
+
+def store(key: str, response: str):
+    global _bytes
+    size = len(key) + len(response.encode())
+    if size > LLM_CACHE_MAX_BYTES:
+        return
+    if key in _entries:
+        _bytes -= _entries.pop(key)[2]
+    _entries[key] = (time.monotonic() + LLM_CACHE_TTL, response, size)
+    _bytes += size
+    while len(_entries) > LLM_CACHE_MAX_ENTRIES or _bytes > LLM_CACHE_MAX_BYTES:
+        _, (_, _, evicted) = _entries.popitem(last=False)
+        _bytes -= evicted
+
+
+# === Cached LLM Call ===
+# Returns (response, llm_seconds, cache_status) where cache_status is one of
+# "hit", "coalesced" (shared an identical in-flight request), "miss" or "bypass".
+async def ask(llm_func, prompt: str, provider: str, model: str, params: dict,
+              use_cache: bool = True) -> tuple[str, float, str]:
+    if not use_cache or LLM_CACHE_TTL <= 0:
+        response, elapsed = await llm_func(prompt)
+        return response, elapsed, "bypass"
+
+    key = cache_key(prompt, provider, model, params)
+    response = lookup(key)
+    if response is not None:
+        metrics.incr("llm_cache_hits")
+        return response, 0.0, "hit"
+
+    task = _inflight.get(key)
+    if task is not None:
+        metrics.incr("llm_cache_coalesced")
+        status = "coalesced"
+    else:
+        metrics.incr("llm_cache_misses")
+        status = "miss"
+        task = _inflight[key] = asyncio.create_task(_call(key, llm_func, prompt, provider))
+        # Every caller may be gone by the time it fails; mark the exception as retrieved
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    start = time.perf_counter()
+    # The upstream call belongs to the cache, not to whichever request started it: a caller that
+    # is cancelled (client disconnected) stops waiting, and everyone else still gets the answer
+    response, elapsed = await asyncio.shield(task)
+    if status == "coalesced":
+        elapsed = time.perf_counter() - start
+    return response, elapsed, status
+
+
+async def _call(key: str, llm_func, prompt: str, provider: str) -> tuple[str, float]:
+    try:
+        response, elapsed = await llm_func(prompt)
+    finally:
+        _inflight.pop(key, None)
+    if response not in UNCACHEABLE:
+        store(key, response)
+    else:
+        logging.info(f"[LLM CACHE] Not caching failed {provider} response")
+    return response, elapsed
+
+
+def cache_stats() -> dict:
+    return {"entries": len(_entries), "bytes": _bytes, "inflight": len(_inflight)}
@@ -1,37 +1,72 @@
-import os
 import time
 import logging
-import httpx
+import admission
+import sse
+
+from config import GEMINI_API_KEY, GEMINI_BASE_URL
 
-# Set your Gemini API key
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or "YOUR_API_KEY"
 GEMINI_MODEL = "gemini-1.5-flash"  # From AI Studio
+GEMINI_SAMPLING = {}  # API defaults
+GEMINI_FAILED = "Gemini failed to respond."
 
 async def ask_gemini(prompt: str) -> tuple[str, float]:
     try:
         start = time.time()
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+        url = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
         headers = { "Content-Type": "application/json" }
         payload = {
             "contents": [
                 {
                     "parts": [{"text": prompt}]
                 }
-            ]
+            ],
+            "generationConfig": GEMINI_SAMPLING
         }
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+        cost = admission.chat_cost([{"content": prompt}], GEMINI_SAMPLING.get("maxOutputTokens", 0))
+        response = await admission.post("gemini", url, cost=cost, headers=headers, json=payload, timeout=15.0)
+        response.raise_for_status()
 
-            data = response.json()
-            output = data["candidates"][0]["content"]["parts"][0]["text"]
-            elapsed = time.time() - start
+        data = response.json()
+        output = data["candidates"][0]["content"]["parts"][0]["text"]
+        elapsed = time.time() - start
 
-            logging.info(f"[GEMINI] LLM took {elapsed:.2f}s: {output}")
-            return output, elapsed
+        logging.info(f"[GEMINI] LLM took {elapsed:.2f}s: {output}")
+        return output, elapsed
 
     except Exception:
         logging.exception("[GEMINI] Gemini API error")
-        return "Gemini failed to respond.", 0.0
+        return GEMINI_FAILED, 0.0
+
+
+# === Streaming (SSE) ===
+# Chat-style messages (as built by conversation.Conversation) to Gemini contents; system
+# messages become the system instruction and consecutive turns of one role are merged.
+def to_gemini_request(messages: list[dict]) -> dict:
+    system, contents = [], []
+    for message in messages:
+        if message["role"] == "system":
+            system.append({"text": message["content"]})
+            continue
+        role = "model" if message["role"] == "assistant" else "user"
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].append({"text": message["content"]})
+        else:
+            contents.append({"role": role, "parts": [{"text": message["content"]}]})
+    payload = {"contents": contents, "generationConfig": GEMINI_SAMPLING}
+    if system:
+        payload["systemInstruction"] = {"parts": system}
+    return payload
+
+# Yields text deltas as Gemini produces them, like server.stream_gpt
+async def stream_gemini(messages: list[dict]):
+    url = f"{GEMINI_BASE_URL}/v1beta/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+    headers = { "Content-Type": "application/json" }
+
+    cost = admission.chat_cost(messages, GEMINI_SAMPLING.get("maxOutputTokens", 0))
+    async with admission.stream("gemini", "POST", url, cost=cost, headers=headers, json=to_gemini_request(messages),
+                                timeout=60.0) as response:
+        await sse.raise_for_status(response, "gemini")
+        async for token in sse.gemini_deltas(response):
+            yield token
@@ -0,0 +1,198 @@
+import os
+import time
+import asyncio
+import logging
+from functools import partial
+from collections import deque, defaultdict
+
+import metrics
+from llm import ask_gpt, GPT_FAILED, AZURE_OPENAI_DEPLOYMENT
+from llm_gemini import ask_gemini, GEMINI_FAILED, GEMINI_MODEL
+
+# === Hedging Config ===
+# The backup request fires once the primary has been silent for longer than its rolling
+# LLM_HEDGE_QUANTILE latency (clamped), or immediately if the primary fails first.
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "1.5"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.25"))
+LLM_HEDGE_MAX_DELAY = float(os.getenv("LLM_HEDGE_MAX_DELAY", "5.0"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+LLM_HEDGE_MIN_SAMPLES = 20
+# A second Azure deployment to hedge against; Gemini is the backup when unset
+LLM_HEDGE_BACKUP_DEPLOYMENT = os.getenv("LLM_HEDGE_BACKUP_DEPLOYMENT")
+
+FAILED_RESPONSES = {GPT_FAILED, GEMINI_FAILED}
+
+
+# === Adaptive Hedge ===
+# Successful primary latencies are kept in a rolling window. A primary that lost the race is
+# recorded with the time it had run when cancelled, a lower bound that keeps the threshold
+# honest. Failures are only counted: a burst of fast errors would otherwise drag the threshold
+# down and get healthy primaries hedged.
+class Hedger:
+    def __init__(self, name: str):
+        self.name = name
+        self.primary_latency = deque(maxlen=LLM_HEDGE_WINDOW)
+        self.hedged_latency = deque(maxlen=LLM_HEDGE_WINDOW)
+        self.counts = defaultdict(int)
+
+    def _count(self, event: str):
+        self.counts[event] += 1
+        metrics.incr(f"llm_hedge_{self.name}_{event}")
+
+    def threshold(self) -> float:
+        if len(self.primary_latency) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_INITIAL_DELAY
+        delay = metrics.quantile(list(self.primary_latency), LLM_HEDGE_QUANTILE)
+        return min(max(delay, LLM_HEDGE_MIN_DELAY), LLM_HEDGE_MAX_DELAY)
+
+    def _finish(self, start: float, winner: str):
+        elapsed = time.perf_counter() - start
+        self.hedged_latency.append(elapsed)
+        self._count(f"{winner}_wins")
+        metrics.observe("llm_hedged_seconds", elapsed, hedger=self.name, winner=winner)
+        return elapsed
+
+    # Complete answers: primary/backup are ask_* style coroutines returning (response, seconds)
+    async def ask(self, primary, backup, prompt: str) -> tuple[str, float]:
+        start = time.perf_counter()
+        self._count("requests")
+        primary_task = asyncio.create_task(primary(prompt))
+        roles = {primary_task: "primary"}
+        try:
+            done, _ = await asyncio.wait(roles, timeout=self.threshold())
+            if done:
+                response = _response(primary_task)
+                if response not in FAILED_RESPONSES:
+                    self.primary_latency.append(time.perf_counter() - start)
+                    return response, self._finish(start, "primary")
+                self._count("primary_failures")
+            else:
+                self._count("hedges")
+                logging.info(f"[HEDGE] {self.name}: no answer in {self.threshold():.2f}s, asking backup")
+
+            roles[asyncio.create_task(backup(prompt))] = "backup"
+            pending = {task for task in roles if not task.done()}
+            response = GPT_FAILED
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    role = roles[task]
+                    response = _response(task)
+                    if response not in FAILED_RESPONSES:
+                        if role == "primary":
+                            self.primary_latency.append(time.perf_counter() - start)
+                        return response, self._finish(start, role)
+                    self._count(f"{role}_failures")
+            return response, time.perf_counter() - start
+        finally:
+            await self._cancel_losers(roles, start)
+
+    async def _cancel_losers(self, roles: dict, start: float):
+        for task, role in roles.items():
+            if task.done():
+                continue
+            task.cancel()
+            if role == "primary":
+                self.primary_latency.append(time.perf_counter() - start)
+        await asyncio.gather(*roles, return_exceptions=True)
+
+    # Token streams: primary/backup are zero-argument callables returning async iterators of text.
+    # The race is on the first non-empty token; the winner's stream is then passed through.
+    async def stream(self, primary, backup):
+        start = time.perf_counter()
+        self._count("requests")
+        streams = {"primary": primary()}
+        primary_task = asyncio.create_task(_first_token(streams["primary"]))
+        roles = {primary_task: "primary"}
+        winner = first = None
+        try:
+            done, _ = await asyncio.wait(roles, timeout=self.threshold())
+            if done:
+                if primary_task.exception() is None:
+                    self.primary_latency.append(time.perf_counter() - start)
+                    winner, first = "primary", primary_task.result()
+                else:
+                    self._count("primary_failures")
+            else:
+                self._count("hedges")
+                logging.info(f"[HEDGE] {self.name}: no first token in {self.threshold():.2f}s, starting backup")
+
+            if winner is None:
+                streams["backup"] = backup()
+                roles[asyncio.create_task(_first_token(streams["backup"]))] = "backup"
+                pending = {task for task in roles if not task.done()}
+                error = primary_task.exception() if primary_task.done() else None
+                while winner is None:
+                    if not pending:
+                        raise error
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        role = roles[task]
+                        if task.exception() is None:
+                            if role == "primary":
+                                self.primary_latency.append(time.perf_counter() - start)
+                            winner, first = role, task.result()
+                            break
+                        self._count(f"{role}_failures")
+                        error = task.exception()
+
+            self._finish(start, winner)
+            await self._cancel_losers(roles, start)
+            for role, stream in streams.items():
+                if role != winner:
+                    await stream.aclose()
+
+            yield first
+            async for token in streams[winner]:
+                yield token
+        finally:
+            await self._cancel_losers(roles, start)
+            for stream in streams.values():
+                await stream.aclose()
+
+    def stats(self) -> dict:
+        primary, hedged = list(self.primary_latency), list(self.hedged_latency)
+        requests = self.counts["requests"]
+        primary_p99, hedged_p99 = metrics.quantile(primary, 0.99), metrics.quantile(hedged, 0.99)
+        return {
+            "threshold": round(self.threshold(), 3),
+            "requests": requests,
+            "hedge_rate": round(self.counts["hedges"] / requests, 3) if requests else 0.0,
+            "backup_wins": self.counts["backup_wins"],
+            "primary_failures": self.counts["primary_failures"],
+            "primary_p95": round(metrics.quantile(primary, 0.95), 3),
+            "primary_p99": round(primary_p99, 3),
+            "hedged_p95": round(metrics.quantile(hedged, 0.95), 3),
+            "hedged_p99": round(hedged_p99, 3),
+            # Lost primaries count with their time at cancellation, so this understates the saving
+            "tail_saved_p99": round(max(primary_p99 - hedged_p99, 0.0), 3),
+        }
+
+
+def _response(task: asyncio.Task) -> str:
+    return task.result()[0] if task.exception() is None else GPT_FAILED
+
+
+async def _first_token(stream):
+    async for token in stream:
+        if token:
+            return token
+    raise RuntimeError("stream ended without any text")
+
+
+# === Hedged Azure -> backup ===
+# "rest" races complete answers for /api/*; "live" races first tokens on /ws/live
+hedger = Hedger("rest")
+live_hedger = Hedger("live")
+ask_backup = partial(ask_gpt, deployment=LLM_HEDGE_BACKUP_DEPLOYMENT) if LLM_HEDGE_BACKUP_DEPLOYMENT else ask_gemini
+BACKUP_MODEL = LLM_HEDGE_BACKUP_DEPLOYMENT or GEMINI_MODEL
+HEDGED_MODEL = f"{AZURE_OPENAI_DEPLOYMENT}+{BACKUP_MODEL}"
+
+
+async def ask_hedged(prompt: str) -> tuple[str, float]:
+    return await hedger.ask(ask_gpt, ask_backup, prompt)
+
+
+def hedge_stats() -> dict:
+    return {"backup": BACKUP_MODEL, "rest": hedger.stats(), "live": live_hedger.stats()}
@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+import metrics
+
+# === Logging Config ===
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Empty logs to stderr; otherwise appended to this file. `python app.py` defaults to app.log.
+LOG_FILE = os.getenv("LOG_FILE", "")
+# text | json (one object per line, for log shippers)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Records waiting for the writer thread; beyond this they are dropped and counted, since
+# blocking the event loop on a slow disk is what the queue is there to avoid
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Libraries that log at INFO once per request (httpx: every TTS sentence); kept to WARNING
+LOG_QUIET_LOGGERS = [name for name in os.getenv("LOG_QUIET_LOGGERS", "httpx,httpcore").split(",") if name]
+
+# The /ws/live session and turn a record belongs to. Read when the record is created, in the
+# logging task's context, so tasks spawned by a turn are attributed to it.
+session_id = contextvars.ContextVar("log_session_id", default=None)
+turn_id = contextvars.ContextVar("log_turn_id", default=None)
+
+_listener = None
+
+
+# === Calling Side (event loop) ===
+# Only attaches the context and enqueues; formatting and I/O happen on the writer thread
+class _ContextQueueHandler(QueueHandler):
+    def prepare(self, record):
+        record.session = session_id.get()
+        record.turn = turn_id.get()
+        # Freeze the message now, the arguments may change before the writer gets to them
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("log_records_dropped")
+
+
+# === Writer Thread ===
+# "<time> [INFO] [session/turn] message key=value ..."
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s [%(levelname)s] %(context)s%(message)s%(field_text)s")
+
+    def formatMessage(self, record):
+        context = [str(v) for v in (getattr(record, "session", None), getattr(record, "turn", None)) if v is not None]
+        record.context = f"[{'/'.join(context)}] " if context else ""
+        record.field_text = "".join(f" {k}={v}" for k, v in getattr(record, "fields", {}).items())
+        return super().formatMessage(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "msg": record.getMessage(), "session": getattr(record, "session", None),
+                 "turn": getattr(record, "turn", None), **getattr(record, "fields", {})}
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def default_handler(path: str = LOG_FILE) -> logging.Handler:
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    return handler
+
+
+# === Setup ===
+# Replaces basicConfig: the root logger gets a single queue handler and the real handlers run
+# on a QueueListener thread. Calling it again swaps the handlers.
+def setup(level: str = LOG_LEVEL, handlers: list = None, queue_size: int = LOG_QUEUE_SIZE):
+    global _listener
+    shutdown()
+    records = queue.Queue(queue_size)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_ContextQueueHandler(records))
+    root.setLevel(level)
+    for name in LOG_QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    _listener = QueueListener(records, *(handlers or [default_handler()]), respect_handler_level=True)
+    _listener.start()
+
+
+# Writes out whatever is still queued
+def shutdown():
+    global _listener
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,76 @@
+import bisect
+from collections import defaultdict
+
+# === Process-wide Counters ===
+_counters = defaultdict(float)
+
+
+def incr(name: str, value: float = 1):
+    _counters[name] += value
+
+
+def snapshot() -> dict:
+    return {name: round(value, 3) for name, value in sorted(_counters.items())}
+
+
+# === Latency Histograms ===
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+# Event-loop scheduling delay is normally well under a millisecond
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# (name, sorted label items) -> [bucket bounds, per-bucket counts, sum, count]
+_histograms = {}
+
+
+def observe(name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+    bounds, counts = histogram[0], histogram[1]
+    index = bisect.bisect_left(bounds, value)
+    if index < len(bounds):
+        counts[index] += 1
+    histogram[2] += value
+    histogram[3] += 1
+
+
+def quantile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+# === Prometheus Text Exposition ===
+def _labels(items, extra=()) -> str:
+    pairs = [*items, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(gauges: dict = None) -> str:
+    lines = []
+    for name, value in sorted(_counters.items()):
+        metric = f"voice_{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    for name, value in sorted((gauges or {}).items()):
+        metric = f"voice_{name}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+    typed = set()
+    for (name, labels), (bounds, buckets, total, count) in sorted(_histograms.items()):
+        metric = f"voice_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(bounds, buckets):
+            cumulative += bucket_count
+            lines.append(f"{metric}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{metric}_sum{_labels(labels)} {round(total, 6)}")
+        lines.append(f"{metric}_count{_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,81 @@
+import os
+import asyncio
+import logging
+from collections import deque
+
+# === Pipeline Config ===
+TTS_MAX_IN_FLIGHT = int(os.getenv("TTS_MAX_IN_FLIGHT", "3"))
+
+_DONE = object()
+
+
+# === Ordered LLM → TTS Pipeline ===
+# submit() starts synthesizing a sentence right away (up to max_in_flight at once) and
+# returns, so the caller keeps reading LLM tokens. A single delivery task hands audio to
+# deliver() in strict submission order, streaming the head sentence as its bytes arrive
+# while later sentences buffer. A slot is freed only once its sentence is fully delivered,
+# which bounds both concurrent syntheses and buffered audio.
+class TTSPipeline:
+    def __init__(self, synthesize, deliver, max_in_flight: int = TTS_MAX_IN_FLIGHT):
+        self.synthesize = synthesize
+        self.deliver = deliver
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._order = asyncio.Queue()
+        self._pending = deque()
+        self._tasks = set()
+        self._delivery = asyncio.create_task(self._deliver_in_order())
+
+    async def submit(self, text: str):
+        if self._delivery.done():
+            await self._delivery
+        await self._slots.acquire()
+        if self._delivery.done():
+            self._slots.release()
+            await self._delivery
+
+        chunks = asyncio.Queue()
+        task = asyncio.create_task(self._synthesize(text, chunks))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._pending.append(text)
+        self._order.put_nowait(chunks)
+
+    async def finish(self):
+        self._order.put_nowait(_DONE)
+        await self._delivery
+
+    # Stops synthesis and delivery; returns the sentences that never fully reached deliver()
+    async def cancel(self) -> list[str]:
+        tasks = [self._delivery, *self._tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return list(self._pending)
+
+    async def _synthesize(self, text: str, chunks: asyncio.Queue):
+        try:
+            async for chunk in self.synthesize(text):
+                chunks.put_nowait(chunk)
+        except Exception:
+            logging.exception(f"[PIPELINE] TTS failed for: {text!r}")
+        finally:
+            chunks.put_nowait(_DONE)
+
+    async def _deliver_in_order(self):
+        try:
+            while True:
+                chunks = await self._order.get()
+                if chunks is _DONE:
+                    return
+                try:
+                    while (chunk := await chunks.get()) is not _DONE:
+                        await self.deliver(chunk)
+                    self._pending.popleft()
+                finally:
+                    self._slots.release()
+        except Exception:
+            # Wake any submit() waiting for a slot so it sees the failure
+            for _ in range(self.max_in_flight):
+                self._slots.release()
+            raise
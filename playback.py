@@ -0,0 +1,246 @@
+import os
+import time
+import wave
+import logging
+import asyncio
+import threading
+
+import metrics
+
+# === Playback Config ===
+PLAYBACK_SAMPLE_RATE = int(os.getenv("PLAYBACK_SAMPLE_RATE", "16000"))
+# Jitter buffer: playback starts (and restarts after an underrun) once PREROLL is queued;
+# writers wait once BUFFER is queued, which bounds how far synthesis runs ahead of the speaker
+PLAYBACK_BUFFER_MS = int(os.getenv("PLAYBACK_BUFFER_MS", "3000"))
+PLAYBACK_PREROLL_MS = int(os.getenv("PLAYBACK_PREROLL_MS", "80"))
+# Size of each device write; also the worst-case delay before a flush goes quiet
+PLAYBACK_BLOCK_MS = int(os.getenv("PLAYBACK_BLOCK_MS", "20"))
+# device | null | file:<path.wav>
+PLAYBACK_SINK = os.getenv("PLAYBACK_SINK", "device")
+
+
+# === Sinks ===
+# open() / write() / close(), called only from the playback thread. write() blocks for
+# roughly the duration of the audio, as a sound card does.
+class DeviceSink:
+    def open(self, sample_rate: int):
+        import pyaudio
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate, output=True)
+
+    def write(self, pcm: bytes):
+        self._stream.write(pcm)
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pyaudio.terminate()
+
+
+# Headless stand-in for a sound card: discards audio, paced to real time
+class NullSink:
+    def open(self, sample_rate: int):
+        self._bytes_per_second = sample_rate * 2
+        self._next_at = 0.0
+
+    def write(self, pcm: bytes):
+        now = time.perf_counter()
+        # After an idle stretch the "device" starts over instead of racing to catch up
+        self._next_at = max(self._next_at, now) + len(pcm) / self._bytes_per_second
+        time.sleep(max(self._next_at - now - len(pcm) / self._bytes_per_second, 0))
+
+    def close(self):
+        pass
+
+
+# Records exactly what would have been played (underrun gaps excluded), paced like NullSink
+class FileSink(NullSink):
+    def __init__(self, path: str):
+        self.path = path
+
+    def open(self, sample_rate: int):
+        super().open(sample_rate)
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm: bytes):
+        self._wav.writeframes(pcm)
+        super().write(pcm)
+
+    def close(self):
+        self._wav.close()
+
+
+def make_sink(spec: str = PLAYBACK_SINK):
+    if spec == "null":
+        return NullSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[5:])
+    return DeviceSink()
+
+
+# === Playback Engine ===
+# One output stream and one thread for the life of the process. Writers append 16-bit mono
+# PCM to a bounded byte buffer; sentences simply follow each other in it, so joins are
+# gapless. end_of_stream() lets the tail drain without waiting for more audio, flush()
+# drops everything queued for a barge-in. Running dry mid-answer counts as an underrun and
+# playback waits for the preroll again.
+class PlaybackEngine:
+    def __init__(self, sample_rate: int = PLAYBACK_SAMPLE_RATE, sink=None, buffer_ms: int = PLAYBACK_BUFFER_MS,
+                 preroll_ms: int = PLAYBACK_PREROLL_MS, block_ms: int = PLAYBACK_BLOCK_MS):
+        self.sample_rate = sample_rate
+        self.sink = sink or make_sink()
+        bytes_per_ms = sample_rate * 2 / 1000
+        self.capacity = int(buffer_ms * bytes_per_ms) // 2 * 2
+        self.preroll = int(preroll_ms * bytes_per_ms) // 2 * 2
+        self.block = max(int(block_ms * bytes_per_ms) // 2 * 2, 2)
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._playing = False
+        self._ended = False
+        self._writing = False
+        self._closed = False
+        self._generation = 0
+        self._starved_at = None
+        self._stats = {"underruns": 0, "starved_seconds": 0.0, "bytes_played": 0, "flushes": 0,
+                       "bytes_flushed": 0, "writer_waits": 0, "max_buffered_ms": 0.0}
+        self.sink.open(sample_rate)
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def _ms(self, size: int) -> float:
+        return size * 1000 / (self.sample_rate * 2)
+
+    # Blocks while the buffer is full; audio still unwritten when flush() runs is dropped
+    def write(self, pcm: bytes):
+        view = memoryview(pcm)
+        with self._cond:
+            generation = self._generation
+            self._ended = False
+            while view:
+                if self._closed or self._generation != generation:
+                    return
+                room = self.capacity - len(self._buffer)
+                if room <= 0:
+                    self._stats["writer_waits"] += 1
+                    self._cond.wait()
+                    continue
+                self._buffer += view[:room]
+                view = view[room:]
+                self._stats["max_buffered_ms"] = max(self._stats["max_buffered_ms"], self._ms(len(self._buffer)))
+                self._cond.notify_all()
+
+    # From the event loop: append directly when there is room, else wait in a worker thread
+    async def feed(self, pcm: bytes):
+        with self._cond:
+            fits = len(self._buffer) + len(pcm) <= self.capacity
+            if fits:
+                self._ended = False
+                self._buffer += pcm
+                self._stats["max_buffered_ms"] = max(self._stats["max_buffered_ms"], self._ms(len(self._buffer)))
+                self._cond.notify_all()
+        if not fits:
+            await asyncio.to_thread(self.write, pcm)
+
+    def end_of_stream(self):
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+
+    def flush(self) -> int:
+        with self._cond:
+            dropped = len(self._buffer)
+            self._buffer.clear()
+            self._generation += 1
+            self._playing = self._ended = False
+            self._starved_at = None
+            self._stats["flushes"] += 1
+            self._stats["bytes_flushed"] += dropped
+            self._cond.notify_all()
+        metrics.incr("playback_flushes")
+        return dropped
+
+    # Plays out everything queued so far; True once the speaker has gone quiet
+    def drain(self, timeout: float = None) -> bool:
+        self.end_of_stream()
+        with self._cond:
+            return self._cond.wait_for(lambda: self._closed or not (self._buffer or self._writing), timeout)
+
+    async def drained(self):
+        await asyncio.to_thread(self.drain)
+
+    def buffered_ms(self) -> float:
+        return self._ms(len(self._buffer))
+
+    def _next_block(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                if self._ended and self._buffer:
+                    break
+                if len(self._buffer) >= (self.block if self._playing else max(self.preroll, self.block)):
+                    break
+                if self._playing and not self._ended:
+                    self._playing = False
+                    self._starved_at = time.perf_counter()
+                    self._stats["underruns"] += 1
+                    metrics.incr("playback_underruns")
+                self._cond.wait()
+            if self._starved_at is not None:
+                self._stats["starved_seconds"] += time.perf_counter() - self._starved_at
+                self._starved_at = None
+            size = min(self.block, len(self._buffer))
+            block = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            self._playing = bool(self._buffer) or not self._ended
+            if not self._buffer and self._ended:
+                self._ended = False
+            self._writing = True
+            self._cond.notify_all()
+            return block
+
+    def _run(self):
+        while (block := self._next_block()) is not None:
+            try:
+                self.sink.write(block)
+            except Exception:
+                logging.exception("[PLAYBACK] Sink write failed")
+            with self._cond:
+                self._writing = False
+                self._stats["bytes_played"] += len(block)
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.sink.close()
+        logging.info(f"[PLAYBACK] Closed: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {"buffered_ms": round(self.buffered_ms(), 1), **self._stats}
+
+
+# === Process-wide Engine ===
+_engine = None
+
+
+def get_engine(sample_rate: int = PLAYBACK_SAMPLE_RATE) -> PlaybackEngine:
+    global _engine
+    if _engine is not None and _engine.sample_rate != sample_rate:
+        logging.warning(f"[PLAYBACK] Reopening output at {sample_rate} Hz (was {_engine.sample_rate} Hz)")
+        shutdown()
+    if _engine is None:
+        _engine = PlaybackEngine(sample_rate)
+    return _engine
+
+
+def shutdown():
+    global _engine
+    if _engine is not None:
+        _engine.close()
+        _engine = None
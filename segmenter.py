@@ -0,0 +1,116 @@
+import os
+import re
+
+# === Segmenter Config ===
+# The first chunk is cut as early as possible to shorten time-to-first-audio; later chunks
+# must reach a minimum length that grows each time, so fewer TTS round-trips are paid once
+# playback is already running ahead of synthesis.
+TTS_FIRST_CHUNK_CHARS = int(os.getenv("TTS_FIRST_CHUNK_CHARS", "24"))
+TTS_MIN_CHUNK_CHARS = int(os.getenv("TTS_MIN_CHUNK_CHARS", "40"))
+TTS_MAX_CHUNK_CHARS = int(os.getenv("TTS_MAX_CHUNK_CHARS", "320"))
+
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "approx",
+    "inc", "ltd", "co", "corp", "dept", "est", "fig", "vol", "jan", "feb", "mar",
+    "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec", "a.m", "p.m",
+    "e.g", "i.e", "u.s", "u.k",
+}
+
+# Terminal punctuation (plus closing quotes/brackets) confirmed by the whitespace after it,
+# so "3.5" or "e.g." mid-stream are never cut before the next character is known
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)")
+_CLAUSE_END = re.compile(r"(?:[,;:]|\s[-–—])(?=\s)")
+_LAST_WORD = re.compile(r"(\S+)$")
+# "1." opening the text or a line is a numbered-list marker, not the end of a sentence
+_LIST_MARKER = re.compile(r"(?:^|\n)[ \t]*\d+$")
+
+
+def _is_abbreviation(text: str, end: int) -> bool:
+    match = _LAST_WORD.search(text, 0, end)
+    if not match:
+        return False
+    word = match.group(1).lower().rstrip(".")
+    if word in ABBREVIATIONS:
+        return True
+    # Initials such as "J." or dotted forms such as "U.S."
+    parts = word.split(".")
+    return all(len(part) == 1 and part.isalpha() for part in parts)
+
+
+# === Incremental Sentence Segmenter ===
+class SentenceSegmenter:
+    def __init__(self, first_chunk_chars: int = TTS_FIRST_CHUNK_CHARS,
+                 min_chunk_chars: int = TTS_MIN_CHUNK_CHARS,
+                 max_chunk_chars: int = TTS_MAX_CHUNK_CHARS,
+                 growth: float = 2.0):
+        self.first_chunk_chars = first_chunk_chars
+        self.min_chunk_chars = min_chunk_chars
+        self.max_chunk_chars = max_chunk_chars
+        self.growth = growth
+        self.chunks_emitted = 0
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._buffer += text
+        chunks = []
+        while (cut := self._next_cut()) is not None:
+            chunk = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+                self.chunks_emitted += 1
+        return chunks
+
+    def flush(self) -> str:
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        if chunk:
+            self.chunks_emitted += 1
+        return chunk
+
+    def reset(self):
+        self._buffer = ""
+        self.chunks_emitted = 0
+
+    def _target_chars(self) -> int:
+        if self.chunks_emitted == 0:
+            return 0
+        target = self.min_chunk_chars * self.growth ** (self.chunks_emitted - 1)
+        return int(min(target, self.max_chunk_chars // 2))
+
+    def _limit_chars(self) -> int:
+        if self.chunks_emitted == 0:
+            return min(self.first_chunk_chars * 3, self.max_chunk_chars)
+        return self.max_chunk_chars
+
+    def _next_cut(self):
+        buffer = self._buffer
+        target = self._target_chars()
+        limit = self._limit_chars()
+
+        sentence_ends = [m.end() for m in _SENTENCE_END.finditer(buffer)
+                         if not (m.group().rstrip("\"'”’)]") == "."
+                                 and (_is_abbreviation(buffer, m.start()) or _LIST_MARKER.search(buffer, 0, m.start())))]
+        for end in sentence_ends:
+            if end >= target:
+                return end
+
+        clause_ends = [m.end() for m in _CLAUSE_END.finditer(buffer)]
+        if self.chunks_emitted == 0:
+            # A clause is natural enough to speak on its own when it gets the audio started
+            for end in clause_ends:
+                if end >= self.first_chunk_chars:
+                    return end
+
+        if len(buffer) <= limit:
+            return None
+
+        # Over the hard limit: prefer the last sentence, then clause, then word boundary
+        for ends in (sentence_ends, clause_ends):
+            fitting = [end for end in ends if end <= limit]
+            if fitting:
+                return fitting[-1]
+        space = buffer.rfind(" ", 0, limit + 1)
+        if space > 0:
+            return space
+        return None
@@ -1,81 +1,216 @@
 import os
+import time
 import asyncio
 import logging
 import json
-import httpx
-import requests
+import config
 import websockets
+import http_pool
+import admission
+import logs
+import metrics
+import tts_cache
+import sse
+from tts_stream import stream_tts, ELEVENLABS_BASE_URL
+from pipeline import TTSPipeline
+from segmenter import SentenceSegmenter
+from turn_detection import TurnDetector, EnergyVAD, deepgram_listen_params, keep_deepgram_alive
+from deepgram_pool import DeepgramStandbyPool
+from tracing import SessionTrace, monitor_event_loop_lag
+from conversation import Conversation
+from llm_hedge import live_hedger, LLM_HEDGE_BACKUP_DEPLOYMENT
+from llm_gemini import stream_gemini, GEMINI_BASE_URL
+from audio_frames import AudioFramer, OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, format_announcement
+from audio_buffer import InboundAudioBuffer
+from speculation import Speculator, LLM_SPECULATION
 from quart import Quart, websocket
-from dotenv import load_dotenv
-from collections import deque
 
-load_dotenv()
 app = Quart(__name__)
 
+# /api/text and /api/audio share this app's event loop and upstream pool
+from app import api
+app.register_blueprint(api)
+
 # ENV
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
-AZURE_OPENAI_API_VERSION = os.getenv("OPENAI_API_VERSION")
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-VOICE_ID = "EXAVITQu4vr4xnSDxMaL"
-MODEL_ID = "eleven_multilingual_v2"
+from config import AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION
+VOICE_SETTINGS = {
+    "stability": 0.4,
+    "similarity_boost": 0.7,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+# Rough speaking rate used to estimate audio seconds saved by cancelling a turn
+SPEECH_CHARS_PER_SECOND = 15
+# Picked per connection with ?llm=
+LLM_PROVIDERS = ("openai", "gemini", "hedged")
+LLM_PROVIDER = "openai"
+# Raw PCM sample rates /ws/live accepts (?encoding=linear16&sample_rate=)
+PCM_SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+# Connect to the LLM and TTS providers as soon as a session opens, before the first utterance
+SESSION_PREWARM = os.getenv("SESSION_PREWARM", "true").lower() == "true"
+
+active_sessions = 0
+# session id -> inbound audio buffer, for /stats/sessions and queue-depth gauges
+inbound_buffers = {}
+deepgram_pool = DeepgramStandbyPool()
+
+logs.setup()
+
+# === Upstream Connection Pool Lifecycle ===
+@app.before_serving
+async def open_upstream_pool():
+    config.check("openai", "elevenlabs", "deepgram")
+    await http_pool.startup()
+    deepgram_pool.start()
+    app.lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+@app.after_serving
+async def close_upstream_pool():
+    app.lag_monitor.cancel()
+    await deepgram_pool.close()
+    await http_pool.shutdown()
+
+@app.route("/stats/upstream")
+async def upstream_stats():
+    return {**http_pool.pool_stats(), "deepgram_standby": deepgram_pool.stats()}
+
+@app.route("/stats/turns")
+async def turn_stats():
+    return metrics.snapshot()
+
+@app.route("/stats/tts-cache")
+async def tts_cache_stats():
+    return tts_cache.cache_stats()
+
+@app.route("/stats/admission")
+async def upstream_admission_stats():
+    return admission.admission_stats()
 
-logging.basicConfig(level=logging.INFO)
+@app.route("/stats/sessions")
+async def session_stats():
+    return {session_id: buffer.summary() for session_id, buffer in inbound_buffers.items()}
+
+# === Prometheus Metrics ===
+@app.route("/metrics")
+async def prometheus_metrics():
+    upstream = http_pool.pool_stats()
+    gauges = {
+        "active_sessions": active_sessions,
+        "audio_inbound_queued_frames": sum(buffer.depth() for buffer in inbound_buffers.values()),
+        "audio_inbound_max_session_depth": max((buffer.depth() for buffer in inbound_buffers.values()), default=0),
+        "process_cpu_seconds": round(time.process_time(), 3),
+        "upstream_requests": upstream["requests"],
+        "upstream_connections_opened": upstream["connections_opened"],
+        "upstream_tls_handshakes": upstream["tls_handshakes"],
+        "upstream_pool_hits": upstream["pool_hits"],
+        "tts_cache_memory_bytes": tts_cache.cache_stats()["memory_bytes"],
+    }
+    for provider, limiter in admission.admission_stats().items():
+        gauges[f"upstream_{provider}_in_flight"] = limiter["active"]
+        gauges[f"upstream_{provider}_waiting"] = limiter["queued_now"]
+    return metrics.render_prometheus(gauges), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 # === Azure GPT Streaming ===
-async def stream_gpt(prompt):
-    url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+async def stream_gpt(messages, deployment=AZURE_OPENAI_DEPLOYMENT):
+    url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{deployment}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
     headers = {
         "api-key": AZURE_OPENAI_API_KEY,
         "Content-Type": "application/json"
     }
     payload = {
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": messages,
         "temperature": 0.7,
         "max_tokens": 500,
         "stream": True
     }
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        async with client.stream("POST", url, headers=headers, json=payload) as response:
-            async for line in response.aiter_lines():
-                if line.startswith("data: "):
-                    try:
-                        yield json.loads(line[6:])["choices"][0]["delta"].get("content", "")
-                    except:
-                        continue
+    cost = admission.chat_cost(messages, payload["max_tokens"])
+    async with admission.stream("openai", "POST", url, cost=cost, headers=headers, json=payload, timeout=60.0) as response:
+        await sse.raise_for_status(response, "openai")
+        async for token in sse.openai_deltas(response):
+            yield token
 
-# === ElevenLabs TTS Streaming
-def get_tts_audio(text_chunk: str) -> bytes:
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream?optimize_streaming_latency=0&output_format=mp3_44100"
+# === Per-connection LLM Provider ===
+# "hedged" races the backup (a second Azure deployment, else Gemini) when Azure's first token
+# is slow; "openai" and "gemini" are never hedged.
+def stream_llm(messages, provider):
+    if provider == "gemini":
+        return stream_gemini(messages)
+    if provider == "hedged":
+        if LLM_HEDGE_BACKUP_DEPLOYMENT:
+            backup = lambda: stream_gpt(messages, LLM_HEDGE_BACKUP_DEPLOYMENT)
+        else:
+            backup = lambda: stream_gemini(messages)
+        return live_hedger.stream(lambda: stream_gpt(messages), backup)
+    return stream_gpt(messages)
 
-    headers = {
-        "xi-api-key": ELEVENLABS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "text": text_chunk,
-        "model_id": MODEL_ID,
-        "voice_settings": {
-            "stability": 0.4,
-            "similarity_boost": 0.7,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-    }
-    response = requests.post(url, headers=headers, json=payload, stream=True)
-    return b"".join(response.iter_content(1024))
+# === Session Prewarm ===
+# Origins a session on this provider will call on its first turn
+def prewarm_urls(provider):
+    urls = [ELEVENLABS_BASE_URL]
+    if provider != "gemini":
+        urls.append(AZURE_OPENAI_ENDPOINT)
+    if provider == "gemini" or (provider == "hedged" and not LLM_HEDGE_BACKUP_DEPLOYMENT):
+        urls.append(GEMINI_BASE_URL)
+    return [url for url in urls if url]
+
+async def prewarm_upstreams(provider):
+    started = time.perf_counter()
+    await asyncio.gather(*(http_pool.prewarm(url) for url in prewarm_urls(provider)))
+    metrics.observe("session_prewarm_seconds", time.perf_counter() - started, stage="http")
+
+# === ElevenLabs TTS Streaming
+# Yields each upstream audio chunk as soon as it arrives
+def synthesize_speech(text_chunk: str, output_format: str = DEFAULT_OUTPUT_FORMAT):
+    return stream_tts(text_chunk, output_format=OUTPUT_FORMATS[output_format]["elevenlabs"], voice_settings=VOICE_SETTINGS)
 
 # === Deepgram Live Transcription Handler
 @app.websocket("/ws/live")
 async def live_conversation():
-    logging.info("🌐 WebSocket connection started")
+    global active_sessions
     ws = websocket._get_current_object()
+    provider = websocket.args.get("llm", LLM_PROVIDER).lower()
+    if provider not in LLM_PROVIDERS:
+        logging.warning(f"⚠️ Unknown LLM '{provider}', using {LLM_PROVIDER}")
+        provider = LLM_PROVIDER
+    # Audio goes back as framed binary messages in the format the client asked for
+    output_format = websocket.args.get("format", DEFAULT_OUTPUT_FORMAT).lower()
+    if output_format not in OUTPUT_FORMATS:
+        logging.warning(f"⚠️ Unknown output format '{output_format}', using {DEFAULT_OUTPUT_FORMAT}")
+        output_format = DEFAULT_OUTPUT_FORMAT
+    # Browsers send WebM/Opus by default; raw PCM clients declare it so the local VAD can run
+    encoding = websocket.args.get("encoding")
+    sample_rate = websocket.args.get("sample_rate", "16000")
+    sample_rate = int(sample_rate) if sample_rate.isdigit() else None
+    if sample_rate not in PCM_SAMPLE_RATES:
+        logging.warning(f"⚠️ Unsupported sample rate '{websocket.args.get('sample_rate')}', using 16000")
+        sample_rate = 16000
+    # ?speculate=true starts the LLM on a stable interim transcript, before endpointing finishes
+    speculate = websocket.args.get("speculate", str(LLM_SPECULATION)).lower() == "true"
+    session = SessionTrace(provider)
+    # Every upstream request this session makes queues in its own fair-share lane
+    admission.session_key.set(session.session_id)
+    logs.session_id.set(session.session_id)
+    conversation = Conversation(provider=provider)
+    active_sessions += 1
+    logging.info(f"🌐 WebSocket connection started LLM: {provider} format: {output_format}")
+    await ws.send(json.dumps(format_announcement(output_format)))
+    # Runs alongside the Deepgram connect below; the user has not said anything yet
+    prewarm = asyncio.create_task(prewarm_upstreams(provider)) if SESSION_PREWARM else None
 
-    audio_queue = asyncio.Queue()
-    gpt_trigger = asyncio.Event()
+    turn_task = None
+    turn_id = 0
+
+    vad = EnergyVAD(sample_rate) if encoding == "linear16" else None
+    detector = TurnDetector()
+    # Only while nothing is being answered and, with a local VAD, once the user has gone quiet
+    speculator = None
+    if speculate:
+        speculator = Speculator(lambda messages: stream_llm(messages, provider),
+                                ready=lambda: not (turn_task and not turn_task.done()) and not (vad and vad.speaking))
+    # Bounded; small frames are batched into fewer, larger Deepgram writes
+    audio_queue = InboundAudioBuffer(sample_rate * 2 if encoding == "linear16" else None)
+    inbound_buffers[session.session_id] = audio_queue
 
     # === Receive audio from frontend
     async def receive_audio():
@@ -84,66 +219,157 @@ async def live_conversation():
                 message = await websocket.receive()
                 if isinstance(message, bytes):
                     logging.debug("📥 Received audio")
+                    if vad is None:
+                        session.speech_heard()
                     await audio_queue.put(message)
         except Exception as e:
             logging.error(f"❌ receive_audio error: {e}")
 
     # === Stream audio to Deepgram
+    # The socket comes from the standby pool when one is ready; audio that arrives meanwhile waits in audio_queue
     async def transcribe_audio():
-        uri = f"wss://api.deepgram.com/v1/listen?punctuate=true&language=en"
-        headers = {"Authorization": f"Token {DEEPGRAM_API_KEY}"}
-
-        async with websockets.connect(uri, extra_headers=headers) as dg_ws:
+        started = time.perf_counter()
+        dg_ws = await deepgram_pool.acquire(deepgram_listen_params(encoding, sample_rate))
+        metrics.observe("session_prewarm_seconds", time.perf_counter() - started, stage="deepgram")
+        try:
             async def send_audio():
                 while True:
                     chunk = await audio_queue.get()
-                    await dg_ws.send(chunk)
+                    if vad is None:
+                        await dg_ws.send(chunk)
+                        continue
+                    frames = vad.process(chunk)
+                    if vad.speaking:
+                        session.speech_heard()
+                    if frames:
+                        await dg_ws.send(b"".join(frames))
 
+            # Only finalized, endpointed utterances start a turn. Interim hypotheses at most start
+            # a speculative LLM request, and only while no answer is in progress.
             async def receive_transcript():
-                async for msg in dg_ws:
-                    data = json.loads(msg)
-                    transcript = data.get("channel", {}).get("alternatives", [{}])[0].get("transcript", "")
-                    if transcript:
-                        logging.info(f"📝 Transcript: {transcript}")
-                        gpt_trigger.transcript = transcript
-                        gpt_trigger.set()
-
-            await asyncio.gather(send_audio(), receive_transcript())
-
-    # === Handle GPT + TTS Response Streaming
-    async def respond_to_audio():
-        while True:
-            await gpt_trigger.wait()
-            prompt = gpt_trigger.transcript
-            gpt_trigger.clear()
-
-            buffer = ""
-            async for token in stream_gpt(prompt):
-                buffer += token
-                logging.info(f"💬 GPT: {token.strip()}")
-                if buffer.endswith(".") or len(buffer) > 80:
-                    audio = get_tts_audio(buffer)
+                while True:
+                    timeout = detector.time_remaining()
+                    if speculator and (wait := speculator.time_remaining()) is not None:
+                        timeout = wait if timeout is None else min(timeout, wait)
                     try:
-                        await ws.send(audio)
-                    except Exception:
-                        logging.warning("⚠️ Client disconnected while sending audio.")
+                        msg = await asyncio.wait_for(dg_ws.recv(), timeout=timeout)
+                        utterance = detector.handle(json.loads(msg))
+                    except asyncio.TimeoutError:
+                        utterance = detector.expire() if detector.time_remaining() == 0 else None
+                    except websockets.exceptions.ConnectionClosedOK:
                         return
-                    buffer = ""
+                    if utterance:
+                        logging.info(f"📝 Transcript: {utterance}")
+                        await start_turn(utterance)
+                    elif speculator:
+                        speculator.update(detector.hypothesis())
+                        speculator.maybe_start(conversation.messages)
+
+            sent = (lambda: vad.frames_sent) if vad else (lambda: audio_queue.stats["sends"])
+            await asyncio.gather(send_audio(), receive_transcript(), keep_deepgram_alive(dg_ws, sent))
+        finally:
+            await dg_ws.close()
+
+    # === Barge-in: a new utterance replaces whatever is still being answered
+    async def start_turn(prompt):
+        nonlocal turn_task, turn_id
+        speculation = speculator.resolve(prompt) if speculator else None
+        if speculation:
+            logging.info(f"🔮 Speculative answer committed ({speculation.tokens_buffered} tokens ready)")
+        if turn_task and not turn_task.done():
+            logging.info("✋ Barge-in: cancelling previous response")
+            metrics.incr("barge_ins")
+            turn_task.cancel()
+            await asyncio.gather(turn_task, return_exceptions=True)
+        trace = session.start_turn()
+        turn_id += 1
+        # Tell the client to drop any audio it has buffered from earlier turns
+        await ws.send(json.dumps({"type": "flush", "turn": turn_id}))
+        turn_task = asyncio.create_task(respond_to_audio(prompt, trace, AudioFramer(turn_id, output_format), speculation))
+
+    # === Handle LLM + TTS Response Streaming
+    # A committed speculation replays its buffered tokens, then follows its live stream
+    async def respond_to_audio(prompt, trace, framer, speculation=None):
+        admission.turn_trace.set(trace)
+        logs.turn_id.set(framer.turn_id)
+        async def synthesize(text):
+            async for audio in synthesize_speech(text, output_format):
+                trace.mark("first_tts_byte")
+                yield audio
 
-            if buffer:
-                audio = get_tts_audio(buffer)
-                try:
-                    await ws.send(audio)
-                except Exception:
-                    logging.warning("⚠️ Client disconnected during final audio.")
-                    return
+        async def deliver(audio):
+            for frame in framer.frames(audio):
+                await ws.send(frame)
+                trace.mark("first_audio_sent")
+
+        # Keep reading tokens while earlier sentences synthesize; audio goes out in order
+        pipeline = TTSPipeline(synthesize, deliver)
+        segmenter = SentenceSegmenter()
+        reply = []
+        tokens = chars = 0
+        # Token-by-token output only at DEBUG; the reply is logged once when the turn ends
+        log_tokens = logging.getLogger().isEnabledFor(logging.DEBUG)
+        llm_stream = speculation.tokens() if speculation else stream_llm(conversation.messages(prompt), provider)
+        try:
+            async for token in llm_stream:
+                trace.mark("first_llm_token")
+                reply.append(token)
+                tokens += 1
+                chars += len(token)
+                if log_tokens:
+                    logging.debug(f"💬 {provider}: {token.strip()}")
+                for chunk in segmenter.feed(token):
+                    await pipeline.submit(chunk)
+
+            if (rest := segmenter.flush()):
+                await pipeline.submit(rest)
+            await pipeline.finish()
+            await ws.send(framer.final())
+            trace.finish()
+        except asyncio.CancelledError:
+            trace.finish(cancelled=True)
+            # Delivery stops first so no more of this answer reaches the client; closing the stream
+            # then aborts the upstream SSE request (a turn cancelled inside pipeline.submit
+            # leaves it paused at a yield)
+            unspoken = sum(map(len, await pipeline.cancel())) + len(segmenter.flush())
+            await llm_stream.aclose()
+            metrics.incr("cancelled_turns")
+            metrics.incr("cancelled_tokens", round(tokens * unspoken / chars) if chars else 0)
+            metrics.incr("cancelled_audio_seconds_saved", unspoken / SPEECH_CHARS_PER_SECOND)
+            raise
+        except Exception as e:
+            # Upstream stream errors now surface here instead of being swallowed token by token
+            logging.warning(f"⚠️ Response aborted: {e!r}")
+            trace.finish(failed=True)
+            metrics.incr("failed_turns")
+            await pipeline.cancel()
+            await llm_stream.aclose()
+            # Still end the turn, or the client keeps waiting for audio that will not come; the
+            # final frame also carries whatever audio the framer held back
+            await ws.send(framer.final())
+        finally:
+            # A barged-in answer is remembered as far as it was generated
+            conversation.add_turn(prompt, "".join(reply))
+            metrics.incr(f"audio_bytes_sent_{output_format}", framer.bytes_sent)
+            logging.info(f"💬 {provider}: {''.join(reply).strip()}",
+                         extra={"fields": {"tokens": tokens, "audio_bytes": framer.bytes_sent}})
 
     try:
-        await asyncio.gather(receive_audio(), transcribe_audio(), respond_to_audio())
+        await asyncio.gather(receive_audio(), transcribe_audio())
     except Exception as e:
         logging.error(f"❌ WebSocket error: {e}")
     finally:
-        logging.info("👋 Connection closed.")
+        if turn_task and not turn_task.done():
+            turn_task.cancel()
+        if prewarm:
+            prewarm.cancel()
+        if speculator:
+            speculator.reset()
+        await conversation.close()
+        active_sessions -= 1
+        inbound_buffers.pop(session.session_id, None)
+        logging.info(f"👋 Connection closed. {session.summary()} inbound={audio_queue.summary()}"
+                     + (f" speculation={speculator.summary()}" if speculator else ""))
 
 # === Start Server ===
 if __name__ == "__main__":
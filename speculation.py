@@ -0,0 +1,152 @@
+import os
+import re
+import time
+import asyncio
+import logging
+
+import metrics
+
+# === Speculation Config ===
+# Start the LLM once the interim transcript has not changed for this long, instead of waiting
+# for Deepgram's endpointing to release the final one. Off unless enabled here or per
+# connection with ?speculate=true.
+LLM_SPECULATION = os.getenv("LLM_SPECULATION", "false").lower() == "true"
+LLM_SPECULATION_STABLE_MS = int(os.getenv("LLM_SPECULATION_STABLE_MS", "200"))
+# Speculative requests allowed per utterance; each discarded one is paid-for tokens
+LLM_SPECULATION_MAX_ATTEMPTS = int(os.getenv("LLM_SPECULATION_MAX_ATTEMPTS", "2"))
+
+_DONE = object()
+
+
+# Casing, sentence punctuation and spacing differ between interim and final results. Only for
+# comparing transcripts: punctuation inside a token ("3.5", "bob@example.com") and operators
+# are kept, so "3.5 + 2" never matches "3 5 2".
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"(?<!\w)[.,!?;:]+|[.,!?;:]+(?!\w)", " ", text.lower()).split())
+
+
+# === One Speculative Stream ===
+# Reads the LLM into a queue in the background; nothing is spoken until the turn commits and
+# iterates tokens(), which replays what was buffered and then follows the live stream.
+class Speculation:
+    def __init__(self, text: str, stream):
+        self.text = text
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.tokens_buffered = 0
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._read(stream))
+
+    async def _read(self, stream):
+        try:
+            async for token in stream:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.tokens_buffered += 1
+                self._queue.put_nowait(token)
+        except Exception as e:
+            self._queue.put_nowait(e)
+        self._queue.put_nowait(_DONE)
+
+    async def tokens(self):
+        try:
+            while (item := await self._queue.get()) is not _DONE:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        # Cancelling the reader closes the upstream stream
+        self._task.cancel()
+
+
+# === Per-session Speculator ===
+# Fed the running hypothesis (final segments plus the latest interim) after every Deepgram
+# message. Stability and the commit check go by normalize(); the LLM is asked the latest
+# hypothesis as transcribed. resolve() is called with the released utterance and returns the speculation to
+# commit, or None after discarding a mismatch. ready() gates speculation on session state,
+# e.g. no answer already playing and the local VAD not hearing speech.
+class Speculator:
+    def __init__(self, start_stream, ready=lambda: True, stable_seconds: float = LLM_SPECULATION_STABLE_MS / 1000,
+                 max_attempts: int = LLM_SPECULATION_MAX_ATTEMPTS):
+        self.start_stream = start_stream
+        self.ready = ready
+        self.stable_seconds = stable_seconds
+        self.max_attempts = max_attempts
+        self.current = None
+        self._hypothesis = ""
+        self._text = ""
+        self._changed_at = 0.0
+        self._attempts = 0
+        self.stats = {"started": 0, "committed": 0, "discarded": 0, "wasted_tokens": 0, "saved_seconds": 0.0}
+
+    def _count(self, name: str, value=1):
+        self.stats[name] += value
+        metrics.incr(f"llm_speculation_{name}", value)
+
+    def update(self, text: str):
+        self._text = text
+        hypothesis = normalize(text)
+        if hypothesis != self._hypothesis:
+            self._hypothesis = hypothesis
+            self._changed_at = time.perf_counter()
+            # The user kept talking; the running guess is already wrong
+            if self.current and self.current.text != hypothesis:
+                self._discard(self.current, "changed")
+
+    # Seconds until the hypothesis counts as stable; None when there is nothing to speculate on
+    def time_remaining(self):
+        if not self._hypothesis or self.current or self._attempts >= self.max_attempts:
+            return None
+        if not self.ready():
+            # Look again shortly
+            return self.stable_seconds
+        return max(self.stable_seconds - (time.perf_counter() - self._changed_at), 0)
+
+    def maybe_start(self, messages_for):
+        if self.time_remaining() != 0:
+            return
+        self._attempts += 1
+        self._count("started")
+        self.current = Speculation(self._hypothesis, self.start_stream(messages_for(self._text)))
+        logging.debug(f"[SPECULATION] Started on '{self._text}'")
+
+    def _discard(self, speculation: Speculation, reason: str):
+        self._count("discarded")
+        self._count("wasted_tokens", speculation.tokens_buffered)
+        metrics.incr(f"llm_speculation_discarded_{reason}")
+        speculation.cancel()
+        if speculation is self.current:
+            self.current = None
+
+    def resolve(self, utterance: str):
+        speculation = self.current
+        self.current = None
+        self._hypothesis = self._text = ""
+        self._attempts = 0
+        if speculation is None:
+            return None
+        if speculation.text != normalize(utterance):
+            self._discard(speculation, "mismatch")
+            return None
+        # How much earlier the first token is available than from a request made now: the
+        # whole head start, or the time to first token if that was shorter
+        saved = min(time.perf_counter(), speculation.first_token_at or float("inf")) - speculation.started_at
+        self._count("committed")
+        self.stats["saved_seconds"] += saved
+        metrics.observe("llm_speculation_saved_seconds", saved)
+        return speculation
+
+    # A turn is starting some other way, or the session is closing
+    def reset(self):
+        if self.current:
+            self._discard(self.current, "abandoned")
+        self._hypothesis = self._text = ""
+        self._attempts = 0
+
+    def summary(self) -> dict:
+        decided = self.stats["committed"] + self.stats["discarded"]
+        return {**self.stats, "saved_seconds": round(self.stats["saved_seconds"], 3),
+                "commit_rate": round(self.stats["committed"] / decided, 3) if decided else None}
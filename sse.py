@@ -0,0 +1,119 @@
+import json
+import logging
+
+import metrics
+
+# orjson is optional; it decodes bytes directly and is several times faster than json
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+class UpstreamStreamError(Exception):
+    pass
+
+
+# === Incremental SSE Parser ===
+# Fed raw byte chunks exactly as they come off the socket; returns the data payload of every
+# event completed by the chunk. Only whole lines are ever sliced out of the buffer, and
+# single-line events (the common case) are returned without joining.
+class SSEParser:
+    def __init__(self):
+        self._buffer = bytearray()
+        self._data = []
+        self.event = None
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        buffer = self._buffer
+        buffer += chunk
+        events = []
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_end = end - 1 if end > start and buffer[end - 1] == 13 else end  # strip \r
+            if line_end == start:
+                if self._data:
+                    events.append(self._data[0] if len(self._data) == 1 else b"\n".join(self._data))
+                    self._data = []
+            elif buffer.startswith(b"data:", start):
+                value = start + 5
+                if value < line_end and buffer[value] == 32:
+                    value += 1
+                self._data.append(bytes(buffer[value:line_end]))
+            elif buffer.startswith(b"event:", start):
+                self.event = bytes(buffer[start + 6:line_end]).strip().decode()
+            # id:, retry: and ": comment" lines carry nothing we use
+            start = end + 1
+        del buffer[:start]
+        return events
+
+    # An event still pending when the stream closes (no trailing blank line)
+    def flush(self) -> list[bytes]:
+        if self._buffer:
+            self.feed(b"\n")
+        events = [b"\n".join(self._data)] if self._data else []
+        self._data = []
+        return events
+
+
+async def iter_events(response):
+    parser = SSEParser()
+    async for chunk in response.aiter_bytes():
+        for data in parser.feed(chunk):
+            yield data
+    for data in parser.flush():
+        yield data
+
+
+async def raise_for_status(response, provider: str):
+    if response.is_error:
+        await response.aread()
+        logging.error(f"[SSE] {provider} returned {response.status_code}: {response.text[:500]}")
+        response.raise_for_status()
+
+
+def _finished(provider: str, reason):
+    if reason is None:
+        metrics.incr(f"llm_stream_truncated_{provider}")
+        raise UpstreamStreamError(f"{provider} stream ended without a finish reason")
+    metrics.incr(f"llm_finish_{provider}_{str(reason).lower()}")
+    if str(reason).lower() != "stop":
+        logging.warning(f"[SSE] {provider} stream finished with reason {reason}")
+
+
+# === Azure OpenAI chat completion chunks ===
+# Yields text deltas. Error payloads raise UpstreamStreamError; a finish reason other than
+# "stop" (length, content_filter) is logged and counted, and a stream that ends without one
+# is treated as cut off.
+async def openai_deltas(response, provider: str = "openai"):
+    finish_reason = None
+    async for data in iter_events(response):
+        if data == b"[DONE]":
+            break
+        chunk = loads(data)
+        if "error" in chunk:
+            raise UpstreamStreamError(f"{provider}: {chunk['error']}")
+        for choice in chunk.get("choices") or ():
+            content = choice.get("delta", {}).get("content")
+            if content:
+                yield content
+            finish_reason = choice.get("finish_reason") or finish_reason
+    _finished(provider, finish_reason)
+
+
+# === Gemini streamGenerateContent?alt=sse ===
+async def gemini_deltas(response, provider: str = "gemini"):
+    finish_reason = None
+    async for data in iter_events(response):
+        chunk = loads(data)
+        if "error" in chunk:
+            raise UpstreamStreamError(f"{provider}: {chunk['error']}")
+        if (blocked := chunk.get("promptFeedback", {}).get("blockReason")):
+            raise UpstreamStreamError(f"{provider}: prompt blocked ({blocked})")
+        for candidate in chunk.get("candidates") or ():
+            for part in candidate.get("content", {}).get("parts", ()):
+                if part.get("text"):
+                    yield part["text"]
+            finish_reason = candidate.get("finishReason") or finish_reason
+    _finished(provider, finish_reason)
@@ -1,32 +1,34 @@
-from dotenv import load_dotenv
-load_dotenv()
-
-import os
 import time
 import logging
-from deepgram import Deepgram
+from config import DEEPGRAM_API_KEY, DEEPGRAM_API_URL
 
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+_deepgram = None
 
-if not DEEPGRAM_API_KEY:
-    raise ValueError("DEEPGRAM_API_KEY is missing.")
 
-deepgram = Deepgram(DEEPGRAM_API_KEY)
+# The SDK (and aiohttp under it) loads on the first /api/audio request, not at server start
+def get_client():
+    global _deepgram
+    if _deepgram is None:
+        if not DEEPGRAM_API_KEY:
+            raise ValueError("DEEPGRAM_API_KEY is missing.")
+        from deepgram import Deepgram
+        _deepgram = Deepgram({"api_key": DEEPGRAM_API_KEY, "api_url": DEEPGRAM_API_URL})
+    return _deepgram
 
-async def transcribe_audio(file_path: str) -> tuple[str, float]:
+# Audio is passed in memory; nothing touches the filesystem
+async def transcribe_audio(audio: bytes, mimetype: str = "audio/wav") -> tuple[str, float]:
     try:
         start = time.time()
-        with open(file_path, 'rb') as audio:
-            response = await deepgram.transcription.prerecorded(
-                {
-                    'buffer': audio,
-                    'mimetype': 'audio/wav'
-                },
-                {
-                    'punctuate': True,
-                    'language': 'en'
-                }
-            )
+        response = await get_client().transcription.prerecorded(
+            {
+                'buffer': audio,
+                'mimetype': mimetype
+            },
+            {
+                'punctuate': True,
+                'language': 'en'
+            }
+        )
         transcript = response['results']['channels'][0]['alternatives'][0]['transcript']
         elapsed = time.time() - start
         logging.info(f"[STT] Transcription took {elapsed:.2f}s: {transcript}")
@@ -0,0 +1,82 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+
+import metrics
+
+# === Turn Stages ===
+# Every stage is measured from the moment the user stopped speaking (last voiced or last
+# received audio frame before the final transcript), so first_audio_sent is time-to-first-audio.
+TURN_STAGES = ("final_transcript", "first_llm_token", "first_tts_byte", "first_audio_sent", "turn_complete")
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+
+
+# === Per-session Latency ===
+class SessionTrace:
+    def __init__(self, provider: str):
+        self.session_id = uuid.uuid4().hex[:8]
+        self.provider = provider
+        self.last_speech_at = time.perf_counter()
+        self.turns = {stage: [] for stage in TURN_STAGES}
+        self.cancelled_turns = 0
+        self.failed_turns = 0
+
+    def speech_heard(self):
+        self.last_speech_at = time.perf_counter()
+
+    def start_turn(self) -> "TurnTrace":
+        turn = TurnTrace(self, self.last_speech_at)
+        turn.mark("final_transcript")
+        return turn
+
+    def summary(self) -> str:
+        ttfa = self.turns["first_audio_sent"]
+        return (f"session={self.session_id} provider={self.provider} turns={len(self.turns['turn_complete'])} "
+                f"cancelled={self.cancelled_turns} failed={self.failed_turns} ttfa_p50={metrics.quantile(ttfa, 0.5):.3f}s "
+                f"ttfa_p95={metrics.quantile(ttfa, 0.95):.3f}s ttfa_p99={metrics.quantile(ttfa, 0.99):.3f}s")
+
+
+# === Per-turn Spans ===
+class TurnTrace:
+    def __init__(self, session: SessionTrace, started_at: float):
+        self.session = session
+        self.started_at = started_at
+        self.marks = {}
+        # Time this turn's upstream requests spent waiting for admission (admission.py)
+        self.queue_wait = 0.0
+
+    def mark(self, stage: str):
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter() - self.started_at
+
+    def queued(self, seconds: float):
+        self.queue_wait += seconds
+
+    # Cancelled (barge-in) and failed (upstream error) turns are counted, not timed
+    def finish(self, cancelled: bool = False, failed: bool = False):
+        if cancelled:
+            self.session.cancelled_turns += 1
+            return
+        if failed:
+            self.session.failed_turns += 1
+            return
+        self.mark("turn_complete")
+        for stage, elapsed in self.marks.items():
+            self.session.turns[stage].append(elapsed)
+            metrics.observe("turn_stage_seconds", elapsed, stage=stage, provider=self.session.provider)
+        metrics.observe("turn_queue_wait_seconds", self.queue_wait, provider=self.session.provider)
+        spans = " ".join(f"{stage}={elapsed:.3f}s" for stage, elapsed in self.marks.items())
+        spans += f" queue_wait={self.queue_wait:.3f}s"
+        logging.info(f"⏱️ Turn {spans}")
+
+
+# === Event-loop Lag ===
+# How late a periodic wake-up fires; anything blocking the loop delays every session on it
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        metrics.observe("event_loop_lag_seconds", max(loop.time() - expected, 0.0), buckets=metrics.LAG_BUCKETS)
@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import config  # loads .env before the settings below are read
+import metrics
+
+# === Cache Config ===
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Once over the limit the disk tier is trimmed down to this fraction of it, so eviction runs
+# in occasional batches rather than on every store
+TTS_CACHE_DISK_TRIM_TO = 0.9
+TTS_CACHE_CHUNK_SIZE = 4096
+
+DEFAULT_PHRASES = [
+    "Hello! How can I help you today?",
+    "Sure.",
+    "Okay.",
+    "Got it.",
+    "One moment, please.",
+    "Sorry, I didn't catch that. Could you say it again?",
+    "Is there anything else I can help you with?",
+    "Goodbye!",
+    "GPT failed.",
+    "Gemini failed to respond.",
+    "Transcription failed.",
+    "No speech detected.",
+]
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_lock = threading.Lock()
+# Disk tier index, key -> size in LRU order, loaded from the directory once per process.
+# Files written by other workers after that are not seen until a restart.
+_disk = None
+_disk_bytes = 0
+_disk_lock = threading.Lock()
+
+
+# === Keys ===
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(text: str, voice_id: str, model_id: str, voice_settings: dict, output_format: str) -> str:
+    material = json.dumps(
+        [normalize_text(text), voice_id, model_id, voice_settings, output_format or "default"],
+        sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.audio")
+
+
+# === Memory Tier (LRU, bounded by bytes) ===
+def _remember(key: str, audio: bytes):
+    global _memory_bytes
+    if len(audio) > TTS_CACHE_MEMORY_BYTES:
+        return
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return
+        _memory[key] = audio
+        _memory_bytes += len(audio)
+        while _memory_bytes > TTS_CACHE_MEMORY_BYTES:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+# === Disk Tier (survives restarts) ===
+# Blocking; callers on the event loop go through lookup_async / asyncio.to_thread
+def _disk_index() -> OrderedDict:
+    global _disk, _disk_bytes
+    if _disk is None:
+        entries = []
+        for root, _, files in os.walk(TTS_CACHE_DIR):
+            for name in files:
+                if name.endswith(".audio"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        # Oldest written first; from here on the order is by use in this process
+        _disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+        _disk_bytes = sum(_disk.values())
+    return _disk
+
+
+def _read_disk(key: str):
+    with _disk_lock:
+        index = _disk_index()
+        if key not in index:
+            return None
+        index.move_to_end(key)
+    try:
+        with open(_disk_path(key), "rb") as f:
+            return f.read() or None
+    except FileNotFoundError:
+        # Evicted by another worker
+        with _disk_lock:
+            _forget_disk(key)
+        return None
+
+
+def _forget_disk(key: str):
+    global _disk_bytes
+    _disk_bytes -= _disk.pop(key, 0)
+
+
+def _write_disk(key: str, audio: bytes):
+    global _disk_bytes
+    path = _disk_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(audio)
+    os.replace(tmp, path)
+    with _disk_lock:
+        index = _disk_index()
+        _forget_disk(key)
+        index[key] = len(audio)
+        _disk_bytes += len(audio)
+        if _disk_bytes > TTS_CACHE_DISK_BYTES:
+            _trim_disk(TTS_CACHE_DISK_BYTES * TTS_CACHE_DISK_TRIM_TO)
+
+
+def _trim_disk(target: float):
+    while _disk and _disk_bytes > target:
+        key = next(iter(_disk))
+        _forget_disk(key)
+        try:
+            os.remove(_disk_path(key))
+        except FileNotFoundError:
+            pass
+
+
+# === Lookup / Store ===
+def _lookup_memory(key: str):
+    with _lock:
+        audio = _memory.get(key)
+        if audio is not None:
+            _memory.move_to_end(key)
+    if audio is not None:
+        metrics.incr("tts_cache_hits_memory")
+    return audio
+
+
+# The file is read once into bytes, which then serve this request and the memory tier
+def _lookup_disk(key: str):
+    audio = _read_disk(key)
+    if audio is None:
+        metrics.incr("tts_cache_misses")
+        return None
+    metrics.incr("tts_cache_hits_disk")
+    _remember(key, audio)
+    return audio
+
+
+# Returns an iterator over cached audio chunks, or None on a miss. Blocking on a disk hit.
+def lookup(key: str):
+    if not TTS_CACHE_ENABLED:
+        return None
+    audio = _lookup_memory(key)
+    if audio is None:
+        audio = _lookup_disk(key)
+    return _chunks(audio) if audio is not None else None
+
+
+# For the event loop: memory hits are served inline; the disk tier is only touched from a
+# worker thread, and not at all for keys its index does not hold
+async def lookup_async(key: str):
+    if not TTS_CACHE_ENABLED:
+        return None
+    audio = _lookup_memory(key)
+    if audio is None:
+        if _disk is not None and key not in _disk:
+            metrics.incr("tts_cache_misses")
+            return None
+        audio = await asyncio.to_thread(_lookup_disk, key)
+    return _chunks(audio) if audio is not None else None
+
+
+def store(key: str, audio: bytes):
+    if not TTS_CACHE_ENABLED or not audio:
+        return
+    _remember(key, audio)
+    try:
+        _write_disk(key, audio)
+    except OSError:
+        logging.exception("[TTS CACHE] Could not write disk tier")
+
+
+def _chunks(audio: bytes):
+    for start in range(0, len(audio), TTS_CACHE_CHUNK_SIZE):
+        chunk = audio[start:start + TTS_CACHE_CHUNK_SIZE]
+        metrics.incr("tts_cache_bytes_served", len(chunk))
+        yield chunk
+
+
+def cache_stats() -> dict:
+    counters = metrics.snapshot()
+    hits = counters.get("tts_cache_hits_memory", 0) + counters.get("tts_cache_hits_disk", 0)
+    misses = counters.get("tts_cache_misses", 0)
+    return {
+        "hits_memory": counters.get("tts_cache_hits_memory", 0),
+        "hits_disk": counters.get("tts_cache_hits_disk", 0),
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "bytes_served": counters.get("tts_cache_bytes_served", 0),
+        "memory_entries": len(_memory),
+        "memory_bytes": _memory_bytes,
+        "disk_entries": len(_disk) if _disk is not None else None,
+        "disk_bytes": _disk_bytes if _disk is not None else None,
+    }
+
+
+# === Pre-warm ===
+# python tts_cache.py [phrases.txt] [output_format ...]
+async def prewarm(phrases: list[str], output_formats: list[str]):
+    from tts_stream import stream_tts
+    import http_pool
+
+    try:
+        for output_format in output_formats:
+            for phrase in phrases:
+                size = 0
+                async for chunk in stream_tts(phrase, output_format=output_format):
+                    size += len(chunk)
+                logging.info(f"[TTS CACHE] Warm {output_format}: {phrase!r} ({size} bytes)")
+    finally:
+        await http_pool.shutdown()
+    logging.info(f"[TTS CACHE] Pre-warm done: {cache_stats()}")
+
+
+if __name__ == "__main__":
+    import logs
+    logs.setup()
+
+    args = sys.argv[1:]
+    phrases = DEFAULT_PHRASES
+    if args and os.path.isfile(args[0]):
+        with open(args.pop(0), encoding="utf-8") as f:
+            phrases = [line.strip() for line in f if line.strip()]
+    asyncio.run(prewarm(phrases, args or ["mp3_44100", "pcm_16000"]))
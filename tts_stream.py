@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import admission
+import tts_cache
+
+from config import ELEVENLABS_API_KEY, ELEVENLABS_BASE_URL
+
+# === ElevenLabs Config ===
+VOICE_ID = "EXAVITQu4vr4xnSDxMaL"  # Rachel
+MODEL_ID = "eleven_multilingual_v2"
+
+DEFAULT_VOICE_SETTINGS = {
+    "stability": 0.4,
+    "similarity_boost": 0.7,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+
+# === Async ElevenLabs TTS Streaming ===
+# Yields audio bytes as ElevenLabs produces them, without blocking the event loop.
+# Repeated phrases are served from tts_cache; a fresh synthesis is cached once complete.
+async def stream_tts(text: str, output_format: str = "mp3_44100", voice_settings: dict = None,
+                     voice_id: str = VOICE_ID, model_id: str = MODEL_ID, chunk_size: int = 4096,
+                     use_cache: bool = True):
+    voice_settings = voice_settings or DEFAULT_VOICE_SETTINGS
+    key = tts_cache.cache_key(text, voice_id, model_id, voice_settings, output_format) if use_cache else None
+    cached = await tts_cache.lookup_async(key) if key else None
+    if cached is not None:
+        for chunk in cached:
+            yield chunk
+        return
+
+    url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id}/stream?optimize_streaming_latency=0&output_format={output_format}"
+    headers = {
+        "xi-api-key": ELEVENLABS_API_KEY,
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "text": text,
+        "model_id": model_id,
+        "voice_settings": voice_settings
+    }
+    parts = []
+
+    # ElevenLabs meters characters
+    async with admission.stream("elevenlabs", "POST", url, cost=len(text), headers=headers, json=payload,
+                                timeout=60.0) as response:
+        if response.is_error:
+            await response.aread()
+            logging.error(f"[TTS] ElevenLabs returned {response.status_code}: {response.text[:200]}")
+            response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size):
+            if chunk:
+                if key:
+                    parts.append(chunk)
+                yield chunk
+
+    if key:
+        await asyncio.to_thread(tts_cache.store, key, b"".join(parts))
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import asyncio
+import operator
+from array import array
+from collections import deque
+from urllib.parse import urlencode
+
+import metrics
+
+# === Turn Detection Config ===
+DEEPGRAM_ENDPOINTING_MS = int(os.getenv("DEEPGRAM_ENDPOINTING_MS", "300"))
+# Deepgram only accepts utterance_end_ms >= 1000; it also drives our local fallback timeout
+UTTERANCE_END_MS = max(int(os.getenv("UTTERANCE_END_MS", "1000")), 1000)
+
+VAD_ENERGY_THRESHOLD = float(os.getenv("VAD_ENERGY_THRESHOLD", "400"))  # RMS of int16 samples
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "600"))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "200"))
+DEEPGRAM_KEEPALIVE_SECONDS = 5
+
+
+def deepgram_listen_params(encoding: str = None, sample_rate: int = None) -> str:
+    params = {
+        "punctuate": "true",
+        "language": "en",
+        "interim_results": "true",
+        "endpointing": DEEPGRAM_ENDPOINTING_MS,
+        "utterance_end_ms": UTTERANCE_END_MS,
+        "vad_events": "true",
+    }
+    if encoding:
+        params["encoding"] = encoding
+        params["sample_rate"] = sample_rate
+        params["channels"] = 1
+    return urlencode(params)
+
+
+# === Endpoint-aware Turn Detector ===
+# Collects is_final segments and releases one utterance when Deepgram reports speech_final,
+# sends UtteranceEnd, or no new final segment arrived within the utterance-end timeout.
+# Interim hypotheses never start a turn.
+class TurnDetector:
+    def __init__(self, utterance_end_timeout: float = UTTERANCE_END_MS / 1000):
+        self.utterance_end_timeout = utterance_end_timeout
+        self._segments = []
+        self._interim = ""
+        self._last_final = None
+
+    def handle(self, message: dict):
+        kind = message.get("type", "Results")
+        if kind == "UtteranceEnd":
+            return self._release("utterance_end")
+        if kind != "Results":
+            return None
+
+        transcript = message.get("channel", {}).get("alternatives", [{}])[0].get("transcript", "")
+        if not message.get("is_final"):
+            if transcript:
+                self._interim = transcript
+                metrics.incr("stt_interim_results_ignored")
+            return None
+
+        self._interim = ""
+        if transcript:
+            self._segments.append(transcript)
+            self._last_final = time.monotonic()
+        if message.get("speech_final"):
+            return self._release("speech_final")
+        return None
+
+    # Best guess at the utterance so far: finalized segments plus the latest interim result
+    def hypothesis(self) -> str:
+        return " ".join(self._segments + [self._interim]).strip()
+
+    def time_remaining(self):
+        if not self._segments:
+            return None
+        return max(self.utterance_end_timeout - (time.monotonic() - self._last_final), 0)
+
+    def expire(self):
+        return self._release("timeout")
+
+    def _release(self, reason: str):
+        if not self._segments:
+            return None
+        utterance = " ".join(self._segments)
+        self._segments = []
+        self._interim = ""
+        self._last_final = None
+        metrics.incr(f"stt_turns_{reason}")
+        return utterance
+
+
+# === Local Energy VAD ===
+# Drops silent linear16 frames before they are sent upstream. A hangover keeps streaming
+# trailing silence long enough for Deepgram endpointing, and a short pre-roll of silence is
+# replayed at speech onset so first syllables are not clipped.
+class EnergyVAD:
+    def __init__(self, sample_rate: int = 16000, threshold: float = VAD_ENERGY_THRESHOLD,
+                 hangover_ms: int = VAD_HANGOVER_MS, preroll_ms: int = VAD_PREROLL_MS):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.hangover = int(sample_rate * hangover_ms / 1000)
+        self.preroll_samples = int(sample_rate * preroll_ms / 1000)
+        self.frames_sent = 0
+        self.speaking = False
+        self._since_voice = self.hangover + 1
+        self._preroll = deque()
+        self._preroll_len = 0
+        self._carry = b""
+
+    @staticmethod
+    def rms(samples: array) -> float:
+        if not samples:
+            return 0.0
+        return (sum(map(operator.mul, samples, samples)) / len(samples)) ** 0.5
+
+    def process(self, frame: bytes) -> list[bytes]:
+        # Keep sample alignment if a frame arrives with an odd byte count
+        frame = self._carry + frame
+        self._carry = b""
+        if len(frame) % 2:
+            frame, self._carry = frame[:-1], frame[-1:]
+        samples = array("h", frame)
+        n = len(samples)
+
+        self.speaking = self.rms(samples) >= self.threshold
+        if self.speaking:
+            self._since_voice = 0
+        else:
+            self._since_voice += n
+
+        if self._since_voice <= self.hangover:
+            out = list(self._preroll) + [frame]
+            self._preroll.clear()
+            self._preroll_len = 0
+            self.frames_sent += 1
+            return out
+
+        self._preroll.append(frame)
+        self._preroll_len += n
+        while self._preroll and self._preroll_len - len(self._preroll[0]) // 2 >= self.preroll_samples:
+            self._preroll_len -= len(self._preroll.popleft()) // 2
+        metrics.incr("vad_frames_dropped")
+        metrics.incr("vad_bytes_dropped", len(frame))
+        return []
+
+
+# Deepgram closes a socket that sees no audio for ~10s: while the VAD holds back silence, or
+# before the user starts speaking, send KeepAlive instead. sent() counts audio sends so far.
+async def keep_deepgram_alive(dg_ws, sent, interval: float = DEEPGRAM_KEEPALIVE_SECONDS):
+    last = sent()
+    while True:
+        await asyncio.sleep(interval)
+        if sent() == last:
+            await dg_ws.send(json.dumps({"type": "KeepAlive"}))
+        last = sent()
@@ -1,171 +1,172 @@
-import os
 import asyncio
 import json
+import config
 import websockets
-import sounddevice as sd
-from dotenv import load_dotenv
-import pyaudio
-import requests
-import httpx
+import http_pool
+import admission
+import playback
+from capture import CaptureRing, MIC_SAMPLE_RATE, MIC_BLOCK_SAMPLES
+import sse
+from tts_stream import stream_tts
+from pipeline import TTSPipeline
+from segmenter import SentenceSegmenter
+from conversation import Conversation
+from turn_detection import TurnDetector, EnergyVAD, deepgram_listen_params, keep_deepgram_alive
+from config import DEEPGRAM_API_KEY, DEEPGRAM_LISTEN_URL, AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION
 import logging
-import wave
-from io import BytesIO
+import logs
 
-load_dotenv()
-
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s"
-)
+logs.setup()
 
 # --- Config ---
-DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-DEEPGRAM_URL = "wss://api.deepgram.com/v1/listen?punctuate=true&language=en"
-
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
-AZURE_OPENAI_API_VERSION = os.getenv("OPENAI_API_VERSION")
+# The mic streams raw 16 kHz linear16, which Deepgram must be told about explicitly
+DEEPGRAM_URL = f"{DEEPGRAM_LISTEN_URL}?{deepgram_listen_params('linear16', 16000)}"
 
-ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
-VOICE_ID = "EXAVITQu4vr4xnSDxMaL"
-MODEL_ID = "eleven_multilingual_v2"
 
-# --- Lock to prevent response overlap ---
-response_lock = asyncio.Lock()
+SYSTEM_PROMPT = "You are a concise voice assistant."
+VOICE_SETTINGS = {
+    "stability": 0.4,
+    "similarity_boost": 0.6
+}
 
 # --- Helpers ---
-def pcm_to_wav(pcm_bytes: bytes, sample_rate=16000, channels=1):
-    buf = BytesIO()
-    wf = wave.open(buf, 'wb')
-    wf.setnchannels(channels)
-    wf.setsampwidth(2)
-    wf.setframerate(sample_rate)
-    wf.writeframes(pcm_bytes)
-    wf.close()
-    return buf.getvalue()
-
-async def ask_gpt_streaming(prompt: str):
+async def ask_gpt_streaming(messages: list[dict]):
     url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
     headers = {"api-key": AZURE_OPENAI_API_KEY, "Content-Type": "application/json"}
     payload = {
-        "messages": [
-            {"role": "system", "content": "You are a concise voice assistant."},
-            {"role": "user", "content": prompt}
-        ],
+        "messages": messages,
         "temperature": 0.7,
         "max_tokens": 300,
         "stream": True
     }
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        async with client.stream("POST", url, headers=headers, json=payload) as resp:
-            async for line in resp.aiter_lines():
-                if line.startswith("data: "):
-                    yield line[6:]
-
-def stream_tts_chunk(text: str) -> bytes:
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}/stream?optimize_streaming_latency=0&output_format=pcm_16000"
-    headers = {
-        "xi-api-key": ELEVENLABS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "text": text,
-        "model_id": MODEL_ID,
-        "voice_settings": {
-            "stability": 0.4,
-            "similarity_boost": 0.6
-        }
-    }
-
-    r = requests.post(url, headers=headers, json=payload, stream=True)
-    r.raise_for_status()
-    pcm = b"".join(r.iter_content(1024))
-    logging.info(f"🔉 Received PCM chunk: {len(pcm)} bytes")
-    return pcm_to_wav(pcm)
-
-async def stream_tts_from_gpt(prompt: str):
-    buffer = ""
-    chunk_limit = 80
-
+    cost = admission.chat_cost(messages, payload["max_tokens"])
+    async with admission.stream("openai", "POST", url, cost=cost, headers=headers, json=payload, timeout=60.0) as resp:
+        await sse.raise_for_status(resp, "openai")
+        async for piece in sse.openai_deltas(resp):
+            yield piece
+
+def synthesize_pcm(text: str):
+    return stream_tts(text, output_format="pcm_16000", voice_settings=VOICE_SETTINGS)
+
+# PCM streams straight into the playback engine; its bounded buffer keeps synthesis from
+# running far ahead of the speaker
+async def stream_tts_from_gpt(prompt: str, conversation: Conversation, engine: playback.PlaybackEngine):
+    pipeline = TTSPipeline(synthesize_pcm, engine.feed)
+    segmenter = SentenceSegmenter()
+    reply = []
     logging.info("🧠 GPT → TTS streaming start")
-    async for token in ask_gpt_streaming(prompt):
-        piece = json.loads(token)["choices"][0]["delta"].get("content", "")
-        if not piece:
-            continue
-        buffer += piece
-        logging.info(f"💬 GPT: {piece.strip()}")
-
-        if buffer.endswith(".") or len(buffer) > chunk_limit:
-            wav = stream_tts_chunk(buffer)
-            yield wav
-            buffer = ""
-
-    if buffer.strip():
-        wav = stream_tts_chunk(buffer)
-        yield wav
+    llm_stream = ask_gpt_streaming(conversation.messages(prompt))
+    try:
+        async for piece in llm_stream:
+            reply.append(piece)
+            for chunk in segmenter.feed(piece):
+                await pipeline.submit(chunk)
+
+        if (rest := segmenter.flush()):
+            await pipeline.submit(rest)
+        await pipeline.finish()
+        engine.end_of_stream()
+    finally:
+        conversation.add_turn(prompt, "".join(reply))
+        logging.info(f"💬 GPT: {''.join(reply).strip()}", extra={"fields": {"tokens": len(reply)}})
+        # Stop delivery into the engine first, then close the stream so the request ends now
+        await pipeline.cancel()
+        await llm_stream.aclose()
     logging.info("✅ GPT → TTS streaming done")
 
 async def deepgram_mic_stream():
     logging.info("🎧 Connecting to Deepgram...")
-    RATE = 16000
-    CHUNK = 1024
+    RATE = MIC_SAMPLE_RATE
 
     async with websockets.connect(DEEPGRAM_URL, extra_headers={"Authorization": f"Token {DEEPGRAM_API_KEY}"}) as ws:
         stop_event = asyncio.Event()
 
         loop = asyncio.get_event_loop()
+        vad = EnergyVAD(RATE)
+        detector = TurnDetector()
+        conversation = Conversation(SYSTEM_PROMPT)
+        engine = playback.get_engine(RATE)
+
+        # The audio thread only copies into the ring; VAD and sends happen on the loop
+        ring = CaptureRing(loop, RATE)
 
         def callback(indata, frames, time, status):
-            if not ws.closed:
-                loop.call_soon_threadsafe(asyncio.create_task, ws.send(indata.tobytes()))
+            ring.write(indata, status)
+
+        # Single sender: batches go out in capture order, one send at a time
+        async def forward_audio():
+            while (batch := await ring.get()) is not None:
+                # Silent audio is dropped locally instead of being streamed to Deepgram
+                frames = vad.process(batch)
+                if frames:
+                    await ws.send(b"".join(frames))
 
         async def send_audio():
+            sender = asyncio.create_task(forward_audio())
             try:
-                with sd.InputStream(samplerate=RATE, channels=1, dtype='int16', blocksize=CHUNK, callback=callback):
+                # Imported here so nothing but the local CLI ever loads PortAudio
+                import sounddevice as sd
+                with sd.RawInputStream(samplerate=RATE, channels=1, dtype='int16', blocksize=MIC_BLOCK_SAMPLES, callback=callback):
                     await stop_event.wait()
             except Exception as e:
                 logging.exception("❌ Error in audio input stream")
+            finally:
+                ring.close()
+                await asyncio.gather(sender, return_exceptions=True)
+                logging.info(f"🎙️ Mic capture: {ring.summary()}")
+
+        response_task = None
+
+        async def respond(transcript):
+            await stream_tts_from_gpt(transcript, conversation, engine)
 
         async def receive_transcript():
+            nonlocal response_task
             try:
-                async for msg in ws:
-                    data = json.loads(msg)
-                    transcript = data.get("channel", {}).get("alternatives", [{}])[0].get("transcript", "")
+                while True:
+                    try:
+                        msg = await asyncio.wait_for(ws.recv(), timeout=detector.time_remaining())
+                        transcript = detector.handle(json.loads(msg))
+                    except asyncio.TimeoutError:
+                        transcript = detector.expire()
                     if transcript:
                         logging.info(f"📝 You said: {transcript}")
-                        async with response_lock:
-                            async for wav_chunk in stream_tts_from_gpt(transcript):
-                                # Play audio using PyAudio
-                                play_audio(wav_chunk)
+                        # Barge-in: a new utterance cancels the LLM stream and pending TTS of the old one,
+                        # and silences whatever of it is still queued for the speaker
+                        if (response_task and not response_task.done()) or engine.buffered_ms():
+                            logging.info("✋ Barge-in: cancelling previous response")
+                            if response_task:
+                                response_task.cancel()
+                                # Flushing before the old pipeline has stopped would let its
+                                # in-flight audio back into the engine
+                                await asyncio.gather(response_task, return_exceptions=True)
+                            engine.flush()
+                        response_task = asyncio.create_task(respond(transcript))
             except websockets.exceptions.ConnectionClosed:
                 logging.info("🔌 WebSocket closed.")
                 stop_event.set()
-
-        await asyncio.gather(send_audio(), receive_transcript())
-
-def play_audio(wav_data: bytes):
-    wf = wave.open(BytesIO(wav_data), 'rb')
-    p = pyaudio.PyAudio()
-    stream = p.open(
-        format=p.get_format_from_width(wf.getsampwidth()),
-        channels=wf.getnchannels(),
-        rate=wf.getframerate(),
-        output=True
-    )
-    chunk = 1024
-    data = wf.readframes(chunk)
-    while data:
-        stream.write(data)
-        data = wf.readframes(chunk)
-
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
+                if response_task:
+                    response_task.cancel()
+
+        keepalive = asyncio.create_task(keep_deepgram_alive(ws, lambda: vad.frames_sent))
+        try:
+            await asyncio.gather(send_audio(), receive_transcript())
+        finally:
+            keepalive.cancel()
+            await conversation.close()
+
+async def main():
+    config.require("openai", "elevenlabs", "deepgram")
+    try:
+        await deepgram_mic_stream()
+    finally:
+        playback.shutdown()
+        await http_pool.shutdown()
 
 # --- Main ---
 if __name__ == "__main__":
     try:
-        asyncio.run(deepgram_mic_stream())
+        asyncio.run(main())
     except KeyboardInterrupt:
         logging.info("👋 Exiting cleanly.")